@@ -0,0 +1,303 @@
+import argparse
+import math
+
+import numpy as np
+import matplotlib.pyplot as plt
+
+# --- Metrics files ---
+#
+# A metrics file is a .npy array of shape (episodes, 2), float32, with
+# columns (reward, win). It is read with mmap_mode="r" and processed in
+# chunks, so plotting a 10M-episode run never loads it all at once.
+
+COLUMNS = {"reward": 0, "win": 1}
+CHUNK = 1 << 20
+
+
+def save_metrics(path, rewards, wins):
+    data = np.empty((len(rewards), 2), dtype=np.float32)
+    data[:, 0] = rewards
+    data[:, 1] = wins
+    np.save(path, data)
+    print(f"Saved metrics to {path}")
+
+
+def load_column(source, column):
+    """A (possibly memory-mapped) 1-D view of one metrics column."""
+    if isinstance(source, str):
+        source = np.load(source, mmap_mode="r")
+    elif not isinstance(source, np.ndarray):
+        source = np.asarray(source)
+    if source.ndim == 1:
+        return source
+    return source[:, COLUMNS[column]]
+
+
+# --------- Smoothing ---------
+def rolling_mean(x, window):
+    """
+    Trailing mean over `window` points via cumulative sums. The first
+    window - 1 points average over what is available, like
+    q_learning.moving_average.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    if window <= 1 or len(x) == 0:
+        return x.copy()
+    c = np.cumsum(x)
+    out = np.empty_like(c)
+    head = min(window, len(x))
+    out[:head] = c[:head] / np.arange(1, head + 1)
+    out[window:] = (c[window:] - c[:-window]) / window
+    return out
+
+
+def iter_rolling_mean(x, window, chunk=CHUNK):
+    """
+    rolling_mean() over a long (memory-mapped) array, one chunk at a time.
+    Only the last `window` values are carried between chunks.
+    Yields (start_index, values).
+    """
+    window = max(1, window)
+    tail = np.zeros(0)
+    for lo in range(0, len(x), chunk):
+        block = np.asarray(x[lo:lo + chunk], dtype=np.float64)
+        joined = np.concatenate((tail, block))
+        c = np.concatenate(([0.0], np.cumsum(joined)))
+        n = np.minimum(np.arange(lo + 1, lo + len(block) + 1), window)
+        end = np.arange(len(tail) + 1, len(joined) + 1)
+        yield lo, (c[end] - c[end - n]) / n
+        tail = joined[-window:]
+
+
+def ema(x, alpha, block=None, prev=None):
+    """
+    Exponential moving average y[t] = (1 - alpha) * y[t-1] + alpha * x[t],
+    with y[-1] = prev (default x[0]). Vectorized per block using scaled
+    cumulative sums; the block length keeps the scale factors well inside
+    float64 range.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    out = np.empty_like(x)
+    if len(x) == 0:
+        return out
+    if alpha >= 1.0:
+        return x.copy()
+    decay = 1.0 - alpha
+    if block is None:
+        block = int(max(1, min(4096, 100 * math.log(10) / -math.log(decay))))
+
+    powers = decay ** -np.arange(1, block + 1)   # (1-a)^-(k+1)
+    if prev is None:
+        prev = x[0]
+    for lo in range(0, len(x), block):
+        seg = x[lo:lo + block]
+        p = powers[:len(seg)]
+        # y_k = (1-a)^(k+1) * (prev + a * sum_{j<=k} x_j (1-a)^-(j+1))
+        y = (prev + alpha * np.cumsum(seg * p)) / p
+        out[lo:lo + len(seg)] = y
+        prev = y[-1]
+    return out
+
+
+def iter_ema(x, alpha, chunk=CHUNK):
+    """ema() over a long (memory-mapped) array, one chunk at a time."""
+    prev = None
+    for lo in range(0, len(x), chunk):
+        values = ema(x[lo:lo + chunk], alpha, prev=prev)
+        yield lo, values
+        prev = values[-1]
+
+
+# --------- Decimation ---------
+class BucketReducer:
+    """
+    Streaming per-bucket count/mean/min/max over `n` points split into
+    `n_buckets` contiguous buckets. Feed it chunks in order with add().
+    """
+
+    def __init__(self, n, n_buckets):
+        n_buckets = max(1, min(n_buckets, n))
+        self.edges = np.linspace(0, n, n_buckets + 1).astype(np.int64)
+        self.count = np.zeros(n_buckets)
+        self.sum = np.zeros(n_buckets)
+        self.min = np.full(n_buckets, np.inf)
+        self.max = np.full(n_buckets, -np.inf)
+
+    def add(self, lo, values):
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        hi = lo + len(values)
+        first = np.searchsorted(self.edges, lo, side="right") - 1
+        inner = self.edges[(self.edges > lo) & (self.edges < hi)] - lo
+        starts = np.concatenate(([0], inner))
+        ids = first + np.arange(len(starts))
+
+        self.count[ids] += np.diff(np.append(starts, len(values)))
+        self.sum[ids] += np.add.reduceat(values, starts)
+        self.min[ids] = np.minimum(self.min[ids], np.minimum.reduceat(values, starts))
+        self.max[ids] = np.maximum(self.max[ids], np.maximum.reduceat(values, starts))
+
+    def centers(self):
+        """1-based episode number at the middle of each bucket."""
+        return (self.edges[:-1] + self.edges[1:]) / 2 + 0.5
+
+    def mean(self):
+        return self.sum / np.maximum(self.count, 1)
+
+    def envelope(self):
+        """(x, y) tracing min and max of every bucket, for line plots."""
+        x = np.repeat(self.centers(), 2)
+        y = np.column_stack((self.min, self.max)).ravel()
+        return x, y
+
+
+def decimate(x, n_buckets, chunk=CHUNK):
+    """BucketReducer over a whole (memory-mapped) array."""
+    reducer = BucketReducer(len(x), n_buckets)
+    for lo in range(0, len(x), chunk):
+        reducer.add(lo, x[lo:lo + chunk])
+    return reducer
+
+
+def percentile_bands(x, n_buckets, q=(5, 50, 95)):
+    """
+    Per-bucket percentiles, shape (len(q), n_buckets), plus bucket centers.
+    Buckets are the same as BucketReducer's and are read one at a time, so
+    only one bucket of a memory-mapped array is in memory.
+    """
+    reducer = BucketReducer(len(x), n_buckets)
+    edges = reducer.edges
+    bands = np.empty((len(q), len(edges) - 1))
+    for i in range(len(edges) - 1):
+        bands[:, i] = np.percentile(np.asarray(x[edges[i]:edges[i + 1]], dtype=np.float64), q)
+    return reducer.centers(), bands
+
+
+def mean_ci(curves, z=1.96):
+    """Mean and normal-approximation CI across seeds (rows of `curves`)."""
+    curves = np.asarray(curves, dtype=np.float64)
+    mean = curves.mean(axis=0)
+    if len(curves) < 2:
+        return mean, mean, mean
+    half = z * curves.std(axis=0, ddof=1) / math.sqrt(len(curves))
+    return mean, mean - half, mean + half
+
+
+# --------- Plotting ---------
+def plot_pixels(fig):
+    """Horizontal resolution of a figure in pixels: the decimation target."""
+    return int(fig.get_size_inches()[0] * fig.dpi)
+
+
+def smoothed_buckets(x, window, n_buckets, chunk=CHUNK, alpha=None):
+    """
+    Decimated rolling mean of a long array, computed chunk by chunk; an
+    exponential moving average instead if `alpha` is given.
+    """
+    reducer = BucketReducer(len(x), n_buckets)
+    chunks = iter_rolling_mean(x, window, chunk) if alpha is None else iter_ema(x, alpha, chunk)
+    for lo, values in chunks:
+        reducer.add(lo, values)
+    return reducer
+
+
+def _smoothing_label(window, alpha):
+    return f"moving avg window={window}" if alpha is None else f"EMA alpha={alpha:g}"
+
+
+def plot_training(source, window=100, out_prefix="training", alpha=None, bands=False):
+    """
+    Reward and win-rate plots for one run. `source` is a metrics file path
+    or an (episodes, 2) array. Cost scales with the plot width, not with
+    the number of episodes.
+
+    alpha   smooth with an EMA of this alpha instead of the moving average
+    bands   draw the 5-95 percentile band and median of the raw reward per
+            bucket instead of its min/max envelope
+    """
+    rewards = load_column(source, "reward")
+    wins = load_column(source, "win")
+    label = _smoothing_label(window, alpha)
+
+    # ----- Reward plot -----
+    fig = plt.figure()
+    n_px = plot_pixels(fig)
+    if bands:
+        x, (low, median, high) = percentile_bands(rewards, n_px)
+        plt.fill_between(x, low, high, alpha=0.3)
+        plt.plot(x, median, alpha=0.5)
+    else:
+        plt.plot(*decimate(rewards, n_px).envelope(), alpha=0.3)
+    smooth = smoothed_buckets(rewards, window, n_px, alpha=alpha)
+    plt.plot(*smooth.envelope())
+    plt.xlabel("Episode")
+    plt.ylabel("Episode reward")
+    plt.title(f"Episode Reward ({label})")
+    plt.tight_layout()
+    reward_path = f"{out_prefix}_reward.png"
+    plt.savefig(reward_path)
+    plt.close(fig)
+    print(f"Saved reward plot to {reward_path}")
+
+    # ----- Win-rate plot -----
+    fig = plt.figure()
+    smooth = smoothed_buckets(wins, window, plot_pixels(fig), alpha=alpha)
+    plt.plot(*smooth.envelope())
+    plt.xlabel("Episode")
+    plt.ylabel("Win rate (smoothed)")
+    plt.title(f"Win Rate ({label})")
+    plt.tight_layout()
+    win_path = f"{out_prefix}_winrate.png"
+    plt.savefig(win_path)
+    plt.close(fig)
+    print(f"Saved win-rate plot to {win_path}")
+
+
+def plot_seeds(sources, column="win", window=100, out_path="seeds.png", alpha=None):
+    """
+    Mean +/- 95% CI of the smoothed `column` across runs (one metrics file
+    or array per seed), truncated to the shortest run. `alpha` selects EMA
+    smoothing as in plot_training.
+    """
+    columns = [load_column(s, column) for s in sources]
+    n = min(len(c) for c in columns)
+
+    fig = plt.figure()
+    n_px = plot_pixels(fig)
+    reducers = [smoothed_buckets(c[:n], window, n_px, alpha=alpha) for c in columns]
+    mean, lo, hi = mean_ci([r.mean() for r in reducers])
+    x = reducers[0].centers()
+
+    plt.fill_between(x, lo, hi, alpha=0.3)
+    plt.plot(x, mean)
+    plt.xlabel("Episode")
+    plt.ylabel(f"{column} (smoothed)")
+    plt.title(f"{column} over {len(columns)} seeds, mean and 95% CI "
+              f"({_smoothing_label(window, alpha)})")
+    plt.tight_layout()
+    plt.savefig(out_path)
+    plt.close(fig)
+    print(f"Saved seed comparison plot to {out_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plot training curves from metrics files.")
+    parser.add_argument("metrics", nargs="+", help=".npy metrics files (q_learning.py --metrics)")
+    parser.add_argument("--window", type=int, default=100)
+    parser.add_argument("--out", default="training",
+                        help="output prefix (one file) or PNG path (several seeds)")
+    parser.add_argument("--column", choices=sorted(COLUMNS), default="win")
+    parser.add_argument("--ema", type=float, metavar="ALPHA", default=None,
+                        help="smooth with an exponential moving average instead of --window")
+    parser.add_argument("--bands", action="store_true",
+                        help="show 5-95 percentile bands of the raw reward (one file)")
+    args = parser.parse_args()
+
+    if len(args.metrics) == 1:
+        plot_training(args.metrics[0], args.window, args.out, alpha=args.ema, bands=args.bands)
+    else:
+        if args.bands:
+            parser.error("--bands needs a single metrics file")
+        out = args.out if args.out.endswith(".png") else f"{args.out}_seeds.png"
+        plot_seeds(args.metrics, args.column, args.window, out, alpha=args.ema)
@@ -0,0 +1,137 @@
+import argparse
+import contextlib
+import io
+import random
+import statistics
+import time
+import timeit
+
+from env import WumpusEnv, CAVE, state_space_size
+from q_learning import q_learn
+from rng import BlockRNG
+from visits import VisitCounts
+
+
+def episodes_to_target(wins, target, window=500):
+    """
+    First episode (1-based) at which the win rate over the last `window`
+    episodes reaches `target`, or None if it never does.
+    """
+    total = 0
+    for i, w in enumerate(wins):
+        total += w
+        if i >= window:
+            total -= wins[i - window]
+        if i + 1 >= window and total >= target * window:
+            return i + 1
+    return None
+
+
+def run_learner(seed, episodes, target, window, **kwargs):
+    """
+    Train one agent with q_learn(**kwargs) and summarize its learning curve.
+    Callable kwargs (e.g. a VisitCounts factory) are called to get a fresh
+    value per run. The environment and the agent get independent streams
+    spawned from `seed`.
+    """
+    kwargs = {k: (v() if callable(v) else v) for k, v in kwargs.items()}
+    env_rng, agent_rng = BlockRNG(seed).spawn(2)
+    kwargs.setdefault("rng", agent_rng)
+    env = WumpusEnv(CAVE, rng=env_rng)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        Q, rewards, wins = q_learn(env, episodes=episodes, **kwargs)
+    elapsed = time.perf_counter() - start
+    return {
+        "to_target": episodes_to_target(wins, target, window),
+        "final_win_rate": sum(wins[-window:]) / len(wins[-window:]),
+        "seconds": elapsed,
+    }
+
+
+def compare(configs, seeds, episodes, target, window):
+    """
+    Run every (name, q_learn kwargs) config on the same seeds and print
+    episodes-to-target-win-rate, final win rate and wall time per config.
+    """
+    print(f"target: {target*100:.0f}% win rate over {window} episodes, "
+          f"{episodes} episodes, seeds {list(seeds)}")
+    print(f"{'learner':<16}{'episodes to target':>22}{'final win':>12}{'time/run':>11}")
+    for name, kwargs in configs:
+        runs = [run_learner(seed, episodes, target, window, **kwargs) for seed in seeds]
+        reached = [r["to_target"] for r in runs if r["to_target"] is not None]
+        if reached:
+            to_target = f"{sum(reached) / len(reached):.0f} ({len(reached)}/{len(runs)})"
+        else:
+            to_target = f"- (0/{len(runs)})"
+        final = sum(r["final_win_rate"] for r in runs) / len(runs)
+        seconds = sum(r["seconds"] for r in runs) / len(runs)
+        print(f"{name:<16}{to_target:>22}{final*100:>11.1f}%{seconds:>10.1f}s")
+
+
+def compare_rng(seeds, episodes):
+    """
+    Per-draw cost of rng.BlockRNG against the stdlib random module, the
+    cost of WumpusEnv.reset() with each as the env stream, and q_learn wall
+    time with each as the env stream (the agent always draws from a
+    BlockRNG; median over seeds; episode lengths differ between streams, so
+    small differences are noise).
+    """
+    stdlib, block = random.Random(0), BlockRNG(0)
+    block_action = block.integers(6)
+    envs = {"stdlib": WumpusEnv(CAVE, seed=0), "BlockRNG": WumpusEnv(CAVE, rng=BlockRNG(1))}
+    for name, std_call, block_call in (
+        ("random()", stdlib.random, block.random),
+        ("int < 6", lambda: stdlib.randrange(6), block_action),
+        ("env.reset()", envs["stdlib"].reset, envs["BlockRNG"].reset),
+    ):
+        std_ns = min(timeit.repeat(std_call, number=100000, repeat=5)) * 1e4
+        block_ns = min(timeit.repeat(block_call, number=100000, repeat=5)) * 1e4
+        print(f"{name:<12} stdlib {std_ns:6.0f} ns   BlockRNG {block_ns:6.0f} ns")
+
+    times = {"stdlib": [], "BlockRNG": []}
+    for seed in seeds:
+        env_rng, agent_rng = BlockRNG(seed).spawn(2)
+        env = WumpusEnv(CAVE, seed=seed)
+        times["stdlib"].append(_timed_q_learn(env, episodes, rng=agent_rng))
+        env_rng, agent_rng = BlockRNG(seed).spawn(2)
+        env = WumpusEnv(CAVE, rng=env_rng)
+        times["BlockRNG"].append(_timed_q_learn(env, episodes, rng=agent_rng))
+    for name, runs in times.items():
+        print(f"q_learn {episodes} episodes, env {name:<8} median {statistics.median(runs):.2f}s "
+              f"over {len(runs)} seeds")
+
+
+def _timed_q_learn(env, episodes, **kwargs):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        q_learn(env, episodes=episodes, **kwargs)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare learners by episodes to a target win rate.")
+    parser.add_argument("--episodes", type=int, default=5000)
+    parser.add_argument("--seeds", type=int, default=3)
+    parser.add_argument("--target", type=float, default=0.15)
+    parser.add_argument("--window", type=int, default=500)
+    parser.add_argument("--lam", type=float, default=0.9)
+    parser.add_argument("--omega", type=float, default=0.8)
+    parser.add_argument("--ucb", type=float, default=0.5)
+    parser.add_argument("--rng", action="store_true",
+                        help="time BlockRNG against the stdlib random module instead")
+    args = parser.parse_args()
+
+    if args.rng:
+        compare_rng(range(args.seeds), args.episodes)
+    else:
+        n_states = state_space_size(len(CAVE))
+        configs = [
+            ("q (one-step)", {"method": "q"}),
+            (f"watkins({args.lam})", {"method": "watkins", "lam": args.lam}),
+            (f"sarsa({args.lam})", {"method": "sarsa", "lam": args.lam}),
+            (f"q 1/n^{args.omega}", {"visits": lambda: VisitCounts(n_states, omega=args.omega)}),
+            (f"q 1/n^{args.omega}+ucb", {"visits": lambda: VisitCounts(n_states, omega=args.omega,
+                                                                         ucb_c=args.ucb)}),
+        ]
+        compare(configs, range(args.seeds), args.episodes, args.target, args.window)
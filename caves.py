@@ -0,0 +1,343 @@
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import random
+import tempfile
+
+import numpy as np
+
+from env import HAZARDS, MAX_ARROWS, state_space_size
+
+# --- Compiled cave cache ---
+#
+#   <cache_dir>/<key>/
+#       adj.npy    int16 (n_rooms + 1, 3), neighbors of room r in row r, 0 = none
+#       meta.json  n_rooms
+#   <cache_dir>/files/<sha256 of a JSON file's bytes>
+#       the <key> that file compiled to
+#
+# <key> is cave_hash(): it covers the adjacency only (with neighbor order,
+# which fixes what actions 0..2 mean), so a cave is compiled once however
+# many files, names, hazard sets or step limits it is registered under.
+# Hazards and max_steps are per registration and not cached. The files/
+# index lets a registered JSON file be found again by hashing its bytes,
+# without parsing it. Row 0 of adj is unused: rooms are 1..n.
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), ".cave_cache")
+MAX_NEIGHBORS = 3  # actions 0..2 move, 3..5 shoot
+
+
+def load_cave_json(path):
+    with open(path, "r") as f:
+        return {int(k): v for k, v in json.load(f).items()}
+
+
+def cave_hash(cave):
+    """Content hash of a cave graph, independent of key order in the file."""
+    canonical = json.dumps(sorted((int(r), list(map(int, n))) for r, n in cave.items()),
+                           separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def validate_cave(cave):
+    rooms = sorted(cave)
+    if rooms != list(range(1, len(rooms) + 1)):
+        raise ValueError("cave rooms must be numbered 1..n_rooms")
+    for room, neighbors in cave.items():
+        if len(neighbors) > MAX_NEIGHBORS:
+            raise ValueError(f"room {room} has {len(neighbors)} neighbors, at most "
+                             f"{MAX_NEIGHBORS} are reachable with the action set")
+        for nbr in neighbors:
+            if nbr not in cave or nbr == room:
+                raise ValueError(f"room {room} has invalid neighbor {nbr}")
+
+
+def compile_cave(cave, cache_dir=CACHE_DIR):
+    """
+    Write the cached arrays for `cave` unless they already exist.
+    Returns the cache directory of this cave.
+    """
+    key = cave_hash(cave)
+    out = os.path.join(cache_dir, key)
+    if os.path.exists(os.path.join(out, "meta.json")):
+        return out
+
+    validate_cave(cave)
+    n_rooms = len(cave)
+    adj = np.zeros((n_rooms + 1, MAX_NEIGHBORS), dtype=np.int16)
+    for room, neighbors in cave.items():
+        adj[room, :len(neighbors)] = neighbors
+
+    # build in a temporary directory and rename, so concurrent workers
+    # never see a half-written entry
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=cache_dir, prefix=".tmp-")
+    np.save(os.path.join(tmp, "adj.npy"), adj)
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump({"n_rooms": n_rooms}, f)
+    try:
+        os.rename(tmp, out)
+    except OSError:
+        # another process compiled the same cave first
+        for name in os.listdir(tmp):
+            os.remove(os.path.join(tmp, name))
+        os.rmdir(tmp)
+    return out
+
+
+def compile_cave_file(path, cache_dir=CACHE_DIR):
+    """
+    compile_cave() for a JSON file. The file is only parsed the first time
+    its bytes are seen; later calls find the entry through the files/ index.
+    """
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    index = os.path.join(cache_dir, "files", digest)
+    if os.path.exists(index):
+        with open(index, "r") as f:
+            out = os.path.join(cache_dir, f.read().strip())
+        if os.path.exists(os.path.join(out, "meta.json")):
+            return out
+
+    out = compile_cave(load_cave_json(path), cache_dir)
+    os.makedirs(os.path.dirname(index), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(index), prefix=".tmp-")
+    with os.fdopen(fd, "w") as f:
+        f.write(os.path.basename(out))
+    os.replace(tmp, index)
+    return out
+
+
+class CompiledCave:
+    """
+    A cave opened from its cache directory (what compile_cave returns), so
+    a worker given the path never touches the JSON. `adj` is memory-mapped;
+    `rooms` is the room -> neighbor list dict WumpusEnv expects, built from
+    it on first use and then kept, so switching caves during training is a
+    reference swap.
+    """
+
+    def __init__(self, path, name=None, hazards=HAZARDS, max_steps=50, cave_id=0):
+        self.path = path
+        self.key = os.path.basename(path.rstrip(os.sep))
+        self.name = name or self.key[:12]
+        self.adj = np.load(os.path.join(path, "adj.npy"), mmap_mode="r")
+        self.n_rooms = len(self.adj) - 1
+        self.hazards = tuple(hazards)
+        self.max_steps = max_steps
+        self.cave_id = cave_id
+        if len(self.hazards) >= self.n_rooms:
+            raise ValueError(f"{self.name}: {len(self.hazards)} hazards leave no "
+                             f"safe room in {self.n_rooms} rooms")
+        self._rooms = None
+
+    @property
+    def rooms(self):
+        if self._rooms is None:
+            self._rooms = {
+                room: [n for n in row if n]
+                for room, row in enumerate(self.adj.tolist()) if room
+            }
+        return self._rooms
+
+    def n_states(self):
+        return state_space_size(self.n_rooms)
+
+    def apply(self, env):
+        """Point `env` at this cave; takes effect at its next reset()."""
+        env.set_cave(self.rooms, self.hazards, self.max_steps)
+
+    def __repr__(self):
+        return (f"CompiledCave({self.name!r}, rooms={self.n_rooms}, "
+                f"hazards={len(self.hazards)}, max_steps={self.max_steps})")
+
+
+class CaveRegistry:
+    """
+    Named caves backed by the compiled cache.
+
+    Each distinct cave graph gets an id 1, 2, ... (0 is the default
+    env.CAVE); the id is what TrajectoryWriter stores in each record's
+    `cave` column. With `ids_path` (see log_cave_index) the ids are loaded
+    from and saved to that file, so appending to a log keeps its ids and
+    main.replay / offline.py can map them back to caves.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, ids_path=None):
+        self.cache_dir = cache_dir
+        self.ids_path = ids_path
+        self.caves = {}
+        self.ids = {}   # cache key -> cave id
+        self._names = {}
+        if ids_path is not None and os.path.exists(ids_path):
+            with open(ids_path, "r") as f:
+                for cave_id, entry in json.load(f).items():
+                    self.ids[entry["key"]] = int(cave_id)
+                    self._names[entry["key"]] = entry["name"]
+
+    def register(self, source, name=None, hazards=HAZARDS, max_steps=50):
+        """`source` is a cave JSON path or a room -> neighbors dict."""
+        if isinstance(source, str):
+            name = name or os.path.splitext(os.path.basename(source))[0]
+            path = compile_cave_file(source, self.cache_dir)
+        else:
+            path = compile_cave(source, self.cache_dir)
+        key = os.path.basename(path)
+        name = name or key[:12]
+        if name in self.caves:
+            raise ValueError(f"cave {name!r} is already registered")
+        if key not in self.ids:
+            self.ids[key] = max(self.ids.values(), default=0) + 1
+        cave = CompiledCave(path, name, hazards, max_steps, cave_id=self.ids[key])
+        self.caves[name] = cave
+        return cave
+
+    def save_ids(self):
+        """Write the cave id table to ids_path."""
+        names = dict(self._names)
+        names.update((cave.key, cave.name) for cave in self)
+        table = {str(cave_id): {"key": key, "name": names.get(key)}
+                 for key, cave_id in sorted(self.ids.items(), key=lambda item: item[1])}
+        with open(self.ids_path, "w") as f:
+            json.dump(table, f, indent=2)
+
+    def __getitem__(self, name):
+        return self.caves[name]
+
+    def __iter__(self):
+        return iter(self.caves.values())
+
+    def __len__(self):
+        return len(self.caves)
+
+    def max_states(self):
+        """Q-table rows needed to train on every registered cave."""
+        return max(cave.n_states() for cave in self)
+
+
+def log_cave_index(log_path):
+    """Cave id table written next to a trajectory log."""
+    return log_path + ".caves.json"
+
+
+def load_log_caves(log_path, cache_dir=CACHE_DIR):
+    """
+    cave id -> CompiledCave for the caves a trajectory log was recorded in
+    (empty if the log only used the default cave).
+    """
+    path = log_cave_index(log_path)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        table = json.load(f)
+    return {int(cave_id): CompiledCave(os.path.join(cache_dir, entry["key"]), entry["name"],
+                                       hazards=(), cave_id=int(cave_id))
+            for cave_id, entry in table.items()}
+
+
+def parse_cave_spec(spec):
+    """
+    "PATH[,max_steps=N][,bats=N][,pits=N]" -> (path, register() kwargs).
+    Omitted counts keep the defaults of HAZARDS (2 bats, 2 pits, 1 Wumpus).
+    """
+    path, *options = spec.split(",")
+    values = {"max_steps": 50, "bats": HAZARDS.count("bat"), "pits": HAZARDS.count("pit")}
+    for option in options:
+        key, _, value = option.partition("=")
+        if key not in values:
+            raise ValueError(f"unknown cave option {key!r} in {spec!r}")
+        values[key] = int(value)
+    hazards = ("bat",) * values["bats"] + ("pit",) * values["pits"] + ("wumpus",)
+    return path, {"hazards": hazards, "max_steps": values["max_steps"]}
+
+
+# --------- Curriculum ---------
+class Curriculum:
+    """
+    Episode schedule over caves: `stages` is a list of (cave, episodes).
+    After the last stage ends its cave is used for the rest of training.
+    """
+
+    def __init__(self, stages):
+        if not stages:
+            raise ValueError("curriculum needs at least one stage")
+        self.caves = [cave for cave, _n in stages]
+        self.ends = list(np.cumsum([n for _cave, n in stages]))
+
+    @classmethod
+    def by_size(cls, caves, episodes_per_stage):
+        """One stage per cave, smallest cave first."""
+        ordered = sorted(caves, key=lambda c: (c.n_rooms, len(c.hazards), c.max_steps))
+        return cls([(cave, episodes_per_stage) for cave in ordered])
+
+    def cave_for(self, episode):
+        stage = bisect.bisect_right(self.ends, episode)
+        return self.caves[min(stage, len(self.caves) - 1)]
+
+    def max_states(self):
+        return max(cave.n_states() for cave in self.caves)
+
+    def describe(self):
+        lines, start = [], 0
+        for cave, end in zip(self.caves, self.ends):
+            lines.append(f"  episodes {start}-{end - 1}: {cave}")
+            start = end
+        return "\n".join(lines)
+
+
+# --------- Random caves ---------
+def generate_cave(n_rooms, seed=None):
+    """
+    Connected cave with up to 3 tunnels per room: a ring plus random chords.
+    Every room has 3 neighbors when n_rooms is even (one room keeps 2 otherwise).
+    """
+    if n_rooms < 4:
+        raise ValueError("a cave needs at least 4 rooms")
+    rng = random.Random(seed)
+    cave = {r: [r % n_rooms + 1, (r - 2) % n_rooms + 1] for r in range(1, n_rooms + 1)}
+
+    # pair up rooms for chords; retry until no chord duplicates a ring edge
+    for _ in range(1000):
+        order = list(cave)
+        rng.shuffle(order)
+        pairs = list(zip(order[::2], order[1::2]))
+        if all(b not in cave[a] for a, b in pairs):
+            break
+    else:
+        raise RuntimeError(f"could not add chords to a {n_rooms}-room cave")
+
+    for a, b in pairs:
+        cave[a].append(b)
+        cave[b].append(a)
+    for neighbors in cave.values():
+        rng.shuffle(neighbors)
+    return cave
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate and compile cave graphs.")
+    parser.add_argument("caves", nargs="*", help="cave JSON files to compile")
+    parser.add_argument("--generate", type=int, nargs="*", default=[], metavar="N_ROOMS",
+                        help="write a random cave with N_ROOMS rooms to data/cave_<N>.json")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--cache", default=CACHE_DIR)
+    args = parser.parse_args()
+
+    paths = list(args.caves)
+    for n_rooms in args.generate:
+        path = os.path.join(os.path.dirname(__file__), "data", f"cave_{n_rooms}.json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(generate_cave(n_rooms, args.seed), f, indent=2)
+        print(f"Saved {n_rooms}-room cave to {path}")
+        paths.append(path)
+
+    registry = CaveRegistry(args.cache)
+    for path in paths:
+        cave = registry.register(path)
+        print(f"{path}: {cave} -> {cave.path}")
+    if len(registry):
+        print(f"Largest Q-table: {registry.max_states()} states "
+              f"(arrows 0..{MAX_ARROWS}, 16 percept/alive combinations per room)")
@@ -0,0 +1,153 @@
+from env import N_ACTIONS
+
+
+class ConvergenceMonitor:
+    """
+    Decides when q_learn can stop early.
+
+    Every `window` episodes the monitor looks at:
+      - max and mean |TD error| of the updates made in the window
+      - the fraction of states whose greedy action changed since the
+        previous window's snapshot of Q
+      - the change in win rate from the previous window
+    A window passes if every threshold that is set (not None) holds.
+    Training stops after `patience` consecutive passing windows. No window
+    counts before `min_episodes` episodes, nor while the caller reports that
+    epsilon is still decaying: the thresholds judge the behaviour policy, and
+    while it is still changing they pass long before learning is done.
+
+    With eval_episodes > 0 and an `evaluate` callback passed to
+    end_episode(), the win rate is measured on eval_episodes greedy episodes
+    at the end of each window instead of on the training episodes.
+    """
+
+    def __init__(self, window=500, td_max=None, td_mean=None, policy_change=None,
+                 win_rate_delta=None, patience=3, min_episodes=0, eval_episodes=0):
+        self.window = window
+        self.td_max = td_max
+        self.td_mean = td_mean
+        self.policy_change = policy_change
+        self.win_rate_delta = win_rate_delta
+        self.patience = patience
+        self.min_episodes = min_episodes
+        self.eval_episodes = eval_episodes
+
+        self.episodes = 0
+        self.streak = 0
+        self.stop_reason = None
+        self.history = []  # one dict of metrics per window
+
+        self._td_max = 0.0
+        self._td_sum = 0.0
+        self._td_count = 0
+        self._wins = 0
+        self._prev_win_rate = None
+        self._prev_policy = None
+
+    def enabled(self):
+        return any(t is not None for t in
+                   (self.td_max, self.td_mean, self.policy_change, self.win_rate_delta))
+
+    def record_td(self, td):
+        """Call with every TD error q_learn applies."""
+        td = abs(td)
+        if td > self._td_max:
+            self._td_max = td
+        self._td_sum += td
+        self._td_count += 1
+
+    def end_episode(self, win, Q, evaluate=None, exploring=False):
+        """
+        Call after each episode. Returns True when training should stop.
+        Pass exploring=True while epsilon has not reached its final value.
+        `evaluate(n)` should return the win rate of n greedy episodes; it is
+        only called at the end of a window, and only if eval_episodes > 0.
+        """
+        self.episodes += 1
+        self._wins += win
+        if self.episodes % self.window:
+            return False
+
+        policy = greedy_policy(Q)
+        metrics = {
+            "episode": self.episodes,
+            "td_max": self._td_max,
+            "td_mean": self._td_sum / max(1, self._td_count),
+            "policy_change": policy_change(self._prev_policy, policy),
+            "behaviour_win_rate": self._wins / self.window,
+        }
+        metrics["win_rate"] = (
+            evaluate(self.eval_episodes)
+            if evaluate is not None and self.eval_episodes > 0
+            else metrics["behaviour_win_rate"]
+        )
+        metrics["win_rate_delta"] = (
+            abs(metrics["win_rate"] - self._prev_win_rate)
+            if self._prev_win_rate is not None else None
+        )
+        self.history.append(metrics)
+
+        self._prev_policy = policy
+        self._prev_win_rate = metrics["win_rate"]
+        self._td_max = self._td_sum = 0.0
+        self._td_count = self._wins = 0
+
+        if exploring or not self.enabled() or self.episodes < self.min_episodes:
+            self.streak = 0
+            return False
+        if self._window_passes(metrics):
+            self.streak += 1
+        else:
+            self.streak = 0
+
+        if self.streak >= self.patience:
+            self.stop_reason = self._describe(metrics)
+            return True
+        return False
+
+    def report(self):
+        if self.stop_reason is not None:
+            return f"Converged after {self.episodes} episodes: {self.stop_reason}"
+        return f"Did not converge within {self.episodes} episodes"
+
+    # ---------- helpers ----------
+
+    def _checks(self, m):
+        """(name, value, threshold) for every threshold that is set."""
+        checks = []
+        for name in ("td_max", "td_mean", "policy_change", "win_rate_delta"):
+            threshold = getattr(self, name)
+            if threshold is not None:
+                checks.append((name, m[name], threshold))
+        return checks
+
+    def _window_passes(self, m):
+        return all(value is not None and value <= threshold
+                   for _name, value, threshold in self._checks(m))
+
+    def _describe(self, m):
+        held = ", ".join(f"{name} {value:.4g} <= {threshold:g}"
+                         for name, value, threshold in self._checks(m))
+        return f"{held} for {self.streak} consecutive windows of {self.window} episodes"
+
+
+def greedy_policy(Q):
+    """
+    state -> greedy action for every state in Q. Missing actions count as
+    0.0 like in q_learn; ties go to the lowest action.
+    """
+    values = {}
+    for (state, action), q in Q.items():
+        values.setdefault(state, [0.0] * N_ACTIONS)[action] = q
+    return {state: qs.index(max(qs)) for state, qs in values.items()}
+
+
+def policy_change(old, new):
+    """Fraction of states whose greedy action differs between two snapshots."""
+    if old is None:
+        return None
+    states = old.keys() | new.keys()
+    if not states:
+        return 0.0
+    changed = sum(1 for s in states if old.get(s) != new.get(s))
+    return changed / len(states)
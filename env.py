@@ -1,3 +1,4 @@
+import itertools
 import json
 import os
 import random
@@ -12,13 +13,88 @@ if not os.path.exists(MAP_PATH):
 with open(MAP_PATH, "r") as f:
     CAVE = {int(k): v for k, v in json.load(f).items()}
 
+# --- Percept messages ---
+SMELL_MSG = "You smell something terrible nearby."
+RUSTLE_MSG = "You hear a rustling."
+BREEZE_MSG = "You feel a cold wind blowing from a nearby cavern."
+
+# --- Percept codes ---
+#
+# WumpusEnv.percept_code packs the current percepts into one byte:
+# bits 2..0 are (smell, rustle, breeze), bits 6..4 the order they were
+# listed in, as an index into PERCEPT_ORDERS. trajectory.py logs it as-is.
+PERCEPTS = (SMELL_MSG, RUSTLE_MSG, BREEZE_MSG)
+PERCEPT_ORDERS = list(itertools.permutations(PERCEPTS))
+
+
+def _percept_codes():
+    """tuple(percepts) -> percept code, for every subset in every order."""
+    codes = {}
+    for order_code, order in enumerate(PERCEPT_ORDERS):
+        for n in range(len(PERCEPTS) + 1):
+            for subset in itertools.permutations(PERCEPTS, n):
+                if all(order.index(a) < order.index(b) for a, b in zip(subset, subset[1:])):
+                    bits = sum(4 >> PERCEPTS.index(msg) for msg in subset)
+                    codes.setdefault(subset, (order_code << 4) | bits)
+    return codes
+
+
+PERCEPT_CODES = _percept_codes()
+
+# --- Step events, reported as info["event"] by WumpusEnv.step ---
+EVENTS = (
+    "none",           # step after the game was over
+    "move",           # moved into a safe room
+    "bat",            # carried off by bats
+    "pit",            # fell into a pit
+    "wumpus",         # eaten (walked in, or the Wumpus walked in)
+    "shoot_miss",     # arrow missed
+    "win",            # arrow killed the Wumpus
+    "invalid",        # no such neighbor / no arrows left
+    "out_of_arrows",  # last arrow gone, Wumpus alive
+    "timeout",        # max_steps reached
+)
+
+# --- Default hazards placed by WumpusEnv.reset ---
+HAZARDS = ("bat", "bat", "pit", "pit", "wumpus")
+
+# --- Dense state indexing (for array-backed Q-tables) ---
+N_ACTIONS = 6
+MAX_ARROWS = 5
+
+
+def state_space_size(n_rooms):
+    """Number of distinct encoded states for a cave with n_rooms rooms."""
+    return n_rooms * (MAX_ARROWS + 1) * 16
+
+
+def state_index(state):
+    """
+    Map a state tuple (room, arrows, wumpus_alive, smell, rustle, breeze)
+    to a dense row index in [0, state_space_size(n_rooms)).
+    Rooms are assumed to be numbered 1..n_rooms.
+    """
+    room, arrows, w_alive, smell, rustle, breeze = state
+    idx = (room - 1) * (MAX_ARROWS + 1) + arrows
+    return (((idx * 2 + w_alive) * 2 + smell) * 2 + rustle) * 2 + breeze
+
+
+def index_state(idx):
+    """Inverse of state_index()."""
+    idx, breeze = divmod(idx, 2)
+    idx, rustle = divmod(idx, 2)
+    idx, smell = divmod(idx, 2)
+    idx, w_alive = divmod(idx, 2)
+    room, arrows = divmod(idx, MAX_ARROWS + 1)
+    return (room + 1, arrows, w_alive, smell, rustle, breeze)
+
 
 class WumpusEnv:
     """
     Hunt the Wumpus environment for Q-learning and visualization.
 
     Rooms: 1..20, adjacency from CAVE.
-    Hazards:
+    Hazards (default HAZARDS, one room each):
       - 1 Wumpus
       - 2 bats
       - 2 pits
@@ -28,42 +104,64 @@ class WumpusEnv:
       3,4,5 -> shoot into neighbor index 0,1,2  (if exists)
     """
 
-    def __init__(self, cave, seed=None):
+    def __init__(self, cave, seed=None, hazards=HAZARDS, max_steps=50, rng=None):
         self.cave = cave
-        self.rng = random.Random(seed)
-        self.max_steps = 50
+        self.rooms = tuple(cave)
+        # any object with random(), e.g. rng.BlockRNG
+        self.rng = rng if rng is not None else random.Random(seed)
+        self.hazards = tuple(hazards)
+        self.max_steps = max_steps
 
         self.player_room = None
         self.arrows = 0
         self.threats = {}
+        self.wumpus_room = None  # kept in step with threats
         self.percepts = []
+        self.percept_code = 0
         self.game_over = False
         self.win = False
         self.step_count = 0
+        self.last_event = "none"
 
         self.reset()
 
     # ---------- core API ----------
 
+    def set_cave(self, cave, hazards=None, max_steps=None):
+        """
+        Switch to another cave graph (and optionally hazards / max_steps).
+        Takes effect at the next reset().
+        """
+        self.cave = cave
+        self.rooms = tuple(cave)
+        if hazards is not None:
+            self.hazards = tuple(hazards)
+        if max_steps is not None:
+            self.max_steps = max_steps
+
     def reset(self):
         """Randomize world: threats + safe starting room. Returns initial state."""
+        if len(self.hazards) >= len(self.rooms):
+            raise ValueError(f"{len(self.hazards)} hazards leave no safe room in "
+                             f"a cave of {len(self.rooms)} rooms")
         self.threats = {}
-        rooms = list(self.cave.keys())
+        self.wumpus_room = None
 
         # place threats in empty rooms (no overlap)
-        for threat in ["bat", "bat", "pit", "pit", "wumpus"]:
-            safe_candidates = [r for r in rooms if r not in self.threats]
-            room = self.rng.choice(safe_candidates)
+        for threat in self.hazards:
+            room = self._random_empty_room(self.rooms)
             self.threats[room] = threat
+            if threat == "wumpus":
+                self.wumpus_room = room
 
         # player in random safe room (no threats)
-        safe_start = [r for r in rooms if r not in self.threats]
-        self.player_room = self.rng.choice(safe_start)
+        self.player_room = self._random_empty_room(self.rooms)
 
-        self.arrows = 5
+        self.arrows = MAX_ARROWS
         self.game_over = False
         self.win = False
         self.step_count = 0
+        self.last_event = "none"
 
         self._update_percepts()
         return self._encode_state()
@@ -83,7 +181,8 @@ class WumpusEnv:
         """
         if self.game_over:
             # Do nothing if already done.
-            return self._encode_state(), 0.0, True, {}
+            self.last_event = "none"
+            return self._encode_state(), 0.0, True, {"event": "none"}
 
         self.step_count += 1
         reward = 0.0
@@ -102,24 +201,30 @@ class WumpusEnv:
             if idx < len(neighbors):
                 new_room = neighbors[idx]
                 self.player_room = new_room
+                self.last_event = "move"
                 reward += move_penalty
                 # entering room: check threat
                 reward += self._handle_enter_room()
             else:
+                self.last_event = "invalid"
                 reward += invalid_penalty
 
         elif action in [3, 4, 5]:  # shoot
             idx = action - 3
             if self.arrows <= 0:
+                self.last_event = "invalid"
                 reward += invalid_penalty
             elif idx < len(neighbors):
                 target_room = neighbors[idx]
                 self.arrows -= 1
+                self.last_event = "shoot_miss"
                 reward += shoot_penalty
                 reward += self._handle_shoot(target_room, win_reward, death_penalty)
             else:
+                self.last_event = "invalid"
                 reward += invalid_penalty
         else:
+            self.last_event = "invalid"
             reward += invalid_penalty
 
         # out of arrows and Wumpus still alive -> lose
@@ -130,12 +235,14 @@ class WumpusEnv:
         ):
             self.game_over = True
             self.win = False
+            self.last_event = "out_of_arrows"
             reward += death_penalty
 
         # max steps
         if not self.game_over and self.step_count >= self.max_steps:
             self.game_over = True
             self.win = False
+            self.last_event = "timeout"
             reward += -2.0
 
         # override final reward if terminal from win/lose inside handlers
@@ -150,8 +257,9 @@ class WumpusEnv:
             self._update_percepts()
         else:
             self.percepts = []
+            self.percept_code = 0
 
-        return self._encode_state(), reward, self.game_over, {}
+        return self._encode_state(), reward, self.game_over, {"event": self.last_event}
 
     # ---------- helpers ----------
 
@@ -161,11 +269,21 @@ class WumpusEnv:
             exclude = []
         return [r for r in self.cave.keys() if r not in self.threats and r not in exclude]
 
+    def _random_empty_room(self, rooms):
+        """
+        Uniform pick among `rooms` without a threat, by redrawing on a hit
+        rather than building the list of empty rooms. At least one room
+        must be empty.
+        """
+        draw = self.rng.random
+        n = len(rooms)
+        room = rooms[int(draw() * n)]
+        while room in self.threats:
+            room = rooms[int(draw() * n)]
+        return room
+
     def _find_wumpus_room(self):
-        for r, t in self.threats.items():
-            if t == "wumpus":
-                return r
-        return None
+        return self.wumpus_room
 
     def _handle_enter_room(self):
         """
@@ -176,19 +294,22 @@ class WumpusEnv:
         threat = self.threats.get(self.player_room)
 
         if threat == "bat":
-            # teleport to random empty room (no threats)
-            safe_rooms = self.get_safe_rooms(exclude=[self.player_room])
-            if safe_rooms:
-                self.player_room = self.rng.choice(safe_rooms)
+            self.last_event = "bat"
+            # teleport to random empty room (no threats; the bat's own room
+            # is one of them)
+            if len(self.threats) < len(self.rooms):
+                self.player_room = self._random_empty_room(self.rooms)
             # no extra reward/penalty; mostly just chaos.
             self._update_percepts()
 
         elif threat == "pit":
+            self.last_event = "pit"
             self.game_over = True
             self.win = False
             reward += -5.0
 
         elif threat == "wumpus":
+            self.last_event = "wumpus"
             self.game_over = True
             self.win = False
             reward += -5.0
@@ -209,8 +330,10 @@ class WumpusEnv:
         if target_room == w_room:
             # kill Wumpus -> win
             del self.threats[w_room]
+            self.wumpus_room = None
             self.game_over = True
             self.win = True
+            self.last_event = "win"
             reward += win_reward
             return reward
 
@@ -219,15 +342,21 @@ class WumpusEnv:
             old_room = w_room
             neighbors = self.cave[old_room]
             # Wumpus can move into any neighbor; if it already has threat, skip that room.
-            candidates = [r for r in neighbors if self.threats.get(r) is None]
-            if not candidates:
-                candidates = neighbors[:]  # fallback
-            new_room = self.rng.choice(candidates)
+            # Drawing among all neighbors first and only falling back to the
+            # list of free ones on a hit is still uniform over the free ones.
+            new_room = neighbors[int(self.rng.random() * len(neighbors))]
+            if new_room in self.threats:
+                candidates = [r for r in neighbors if self.threats.get(r) is None]
+                if not candidates:
+                    candidates = neighbors  # fallback
+                new_room = candidates[int(self.rng.random() * len(candidates))]
             del self.threats[old_room]
             self.threats[new_room] = "wumpus"
+            self.wumpus_room = new_room
 
             # If it enters player's room -> player dies
             if new_room == self.player_room:
+                self.last_event = "wumpus"
                 self.game_over = True
                 self.win = False
                 reward += death_penalty
@@ -240,31 +369,23 @@ class WumpusEnv:
         for nbr in self.cave[self.player_room]:
             t = self.threats.get(nbr)
             if t == "wumpus":
-                msg = "You smell something terrible nearby."
+                msg = SMELL_MSG
                 if msg not in self.percepts:
                     self.percepts.append(msg)
             elif t == "bat":
-                msg = "You hear a rustling."
+                msg = RUSTLE_MSG
                 if msg not in self.percepts:
                     self.percepts.append(msg)
             elif t == "pit":
-                msg = "You feel a cold wind blowing from a nearby cavern."
+                msg = BREEZE_MSG
                 if msg not in self.percepts:
                     self.percepts.append(msg)
+        self.percept_code = PERCEPT_CODES[tuple(self.percepts)]
 
     def _percept_flags(self):
         """Return (smell, rustle, breeze) as 0/1 flags."""
-        smell = 0
-        rustle = 0
-        breeze = 0
-        for msg in self.percepts:
-            if "terrible" in msg:
-                smell = 1
-            elif "rustling" in msg:
-                rustle = 1
-            elif "cold wind" in msg:
-                breeze = 1
-        return smell, rustle, breeze
+        code = self.percept_code
+        return (code >> 2) & 1, (code >> 1) & 1, code & 1
 
     def _encode_state(self):
         """
@@ -0,0 +1,163 @@
+import itertools
+import mmap
+import os
+import struct
+import time
+
+import numpy as np
+
+from env import N_ACTIONS, state_index
+
+# --- Snapshot file layout ---
+#
+#   [header: 64 bytes][Q: float64, n_states x n_actions]
+#
+# The trainer (LivePublisher) owns the file and rewrites it in place, so the
+# viewer (LiveReader) can keep a read-only mapping open for the whole run.
+# `seq` works as a seqlock: it is odd while a publish is in progress, and a
+# reader only accepts a copy if it saw the same even value before and after.
+
+MAGIC = b"WQLV"
+VERSION = 1
+
+# magic, version, n_states, n_actions, seq, episode, episodes_total,
+# win_rate, avg_reward, epsilon
+HEADER = struct.Struct("<4sIIIQQQddd")
+SEQ = struct.Struct("<Q")
+SEQ_OFFSET = 16
+# the header around seq: written before seq is set even again
+PREFIX = struct.Struct("<4sIII")
+METRICS = struct.Struct("<QQddd")
+METRICS_OFFSET = SEQ_OFFSET + SEQ.size
+HEADER_SIZE = HEADER.size
+
+
+class LivePublisher:
+    """
+    Trainer side of the live channel.
+
+    publish() copies the current Q dict into the shared array and updates
+    the metrics header. It never truncates or recreates the file, and
+    nothing waits on the viewer.
+
+    q_learn only ever adds keys to Q, and dicts keep insertion order, so the
+    flat array position of the i-th key is computed once (state_index in
+    Python only for keys added since the last publish); the values are then
+    copied in one vectorized assignment.
+    """
+
+    def __init__(self, path, n_states, n_actions=N_ACTIONS):
+        self.path = path
+        self.n_states = n_states
+        self.n_actions = n_actions
+        size = HEADER_SIZE + n_states * n_actions * 8
+
+        self._file = open(path, "w+b")
+        self._file.truncate(size)
+        self._mm = mmap.mmap(self._file.fileno(), size)
+        self.q = np.ndarray(
+            (n_states, n_actions), dtype=np.float64, buffer=self._mm, offset=HEADER_SIZE
+        )
+        self._seq = 0
+        self._source = None
+        self._flat = np.zeros(0, dtype=np.int64)  # flat q position of each Q key, in order
+        self._write_header(0, 0, 0.0, 0.0, 1.0, 0)
+
+    def publish(self, Q, episode, episodes_total, win_rate, avg_reward, epsilon):
+        """Write Q[(state, action)] and the latest metrics into the shared file."""
+        self._seq += 1  # odd: write in progress
+        SEQ.pack_into(self._mm, SEQ_OFFSET, self._seq)
+
+        if Q is not self._source:
+            # a different dict: index it from scratch
+            self._source = Q
+            self._flat = self._flat[:0]
+        n_known = len(self._flat)
+        if len(Q) > n_known:
+            n_actions = self.n_actions
+            added = np.fromiter(
+                (state_index(state) * n_actions + action
+                 for state, action in itertools.islice(Q, n_known, None)),
+                dtype=np.int64, count=len(Q) - n_known,
+            )
+            self._flat = np.concatenate((self._flat, added))
+        self.q.reshape(-1)[self._flat] = np.fromiter(Q.values(), dtype=np.float64, count=len(Q))
+
+        # even: snapshot is consistent
+        self._write_header(episode, episodes_total, win_rate, avg_reward, epsilon, self._seq + 1)
+
+    def close(self):
+        del self.q
+        self._mm.close()
+        self._file.close()
+
+    def _write_header(self, episode, episodes_total, win_rate, avg_reward, epsilon, seq):
+        """Write the metrics, then publish `seq` (even) last."""
+        PREFIX.pack_into(self._mm, 0, MAGIC, VERSION, self.n_states, self.n_actions)
+        METRICS.pack_into(self._mm, METRICS_OFFSET,
+                          episode, episodes_total, win_rate, avg_reward, epsilon)
+        self._seq = seq
+        SEQ.pack_into(self._mm, SEQ_OFFSET, seq)
+
+
+class LiveReader:
+    """
+    Viewer side of the live channel. Opens the snapshot file read-only.
+    """
+
+    def __init__(self, path, wait=True, poll_s=0.25):
+        self.path = path
+        while True:
+            while not os.path.exists(path) or os.path.getsize(path) < HEADER_SIZE:
+                if not wait:
+                    raise FileNotFoundError(f"Missing live snapshot: {path}")
+                time.sleep(poll_s)
+
+            self._file = open(path, "rb")
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, n_states, n_actions = PREFIX.unpack_from(self._mm, 0)
+            # a zero magic means the publisher has sized the file but not
+            # written the header yet
+            if magic != bytes(len(MAGIC)) or not wait:
+                break
+            self.close()
+            time.sleep(poll_s)
+
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a live Q-table snapshot")
+        self.n_states = n_states
+        self.n_actions = n_actions
+
+    def snapshot(self, retries=100):
+        """
+        Return (q_array, meta) for the latest consistent snapshot, where
+        q_array has shape (n_states, n_actions). Returns None if the trainer
+        kept the file busy for all retries.
+        """
+        count = self.n_states * self.n_actions
+        for _ in range(retries):
+            seq_before = SEQ.unpack_from(self._mm, SEQ_OFFSET)[0]
+            if seq_before % 2:
+                time.sleep(0.001)
+                continue
+
+            fields = HEADER.unpack_from(self._mm, 0)
+            q = np.frombuffer(self._mm, dtype=np.float64, count=count, offset=HEADER_SIZE)
+            q = q.reshape(self.n_states, self.n_actions).copy()
+
+            if SEQ.unpack_from(self._mm, SEQ_OFFSET)[0] == seq_before:
+                meta = {
+                    "seq": fields[4],
+                    "episode": fields[5],
+                    "episodes": fields[6],
+                    "win_rate": fields[7],
+                    "avg_reward": fields[8],
+                    "epsilon": fields[9],
+                }
+                return q, meta
+        return None
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
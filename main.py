@@ -1,8 +1,15 @@
+import argparse
+import functools
 import json
+import math
 import os
+import random
+from collections import OrderedDict, deque
+
+import numpy as np
 import pygame
 
-from env import WumpusEnv, CAVE
+from env import WumpusEnv, CAVE, N_ACTIONS, state_index
 
 # --------- Pygame setup ---------
 pygame.init()
@@ -74,50 +81,214 @@ def choose_best_action(state):
     max_q = max(qs)
     candidates = [a for a, q in zip(actions, qs) if q == max_q]
     # fallback: if all zeros or missing, this is still fine
-    import random
     return random.choice(candidates)
 
 
+def choose_live_action(q, state):
+    """
+    Greedy action from a dense (n_states, 6) snapshot array; a random one
+    if the snapshot has no row for `state` (trained on smaller caves).
+    """
+    idx = state_index(state)
+    if idx >= len(q):
+        return random.randrange(N_ACTIONS)
+    qs = q[idx]
+    candidates = np.flatnonzero(qs == qs.max())
+    return int(random.choice(candidates))
+
+
 # --------- Drawing ---------
-def draw_world(env, message=""):
-    screen.fill(BG)
-
-    # draw connections
-    for room, neighbors in CAVE.items():
-        x1, y1 = ROOM_POS[room]
-        for n in neighbors:
-            x2, y2 = ROOM_POS[n]
-            pygame.draw.line(screen, EDGE, (x1, y1), (x2, y2), 2)
-
-    # draw rooms
-    for room, (x, y) in ROOM_POS.items():
-        color = PLAYER_COLOR if room == env.player_room else ROOM_COLOR
-        pygame.draw.circle(screen, color, (int(x), int(y)), 22)
-        pygame.draw.circle(screen, (0, 0, 0), (int(x), int(y)), 22, 2)
-        label = font.render(str(room), True, (0, 0, 0))
-        screen.blit(label, (x - 10, y - 10))
+#
+# The cave graph never changes during an episode, so edges, rooms and labels
+# are rendered once per cave into a background Surface. Each frame is a list
+# of (surface, position) sprites on top of it; only sprites that appeared,
+# moved or disappeared since the previous frame are redrawn and pushed to the
+# display with dirty-rect updates.
+
+ROOM_RADIUS = 22
+GOLDEN_ANGLE = math.pi * (3 - math.sqrt(5))
+
+MAX_SCENES = 8
+
+_scenes = OrderedDict()                 # cave_key(cave) -> (background, room_pos, radius)
+_last_scene = {"cave": None, "scene": None}
+_frame = {"scene": None, "items": []}   # what is currently on screen
+
+
+def layout_rooms(cave):
+    """
+    Room centers for `cave`. Uses the hand-placed ROOM_POS for the standard
+    dodecahedron and a sunflower spiral (even density for any room count)
+    for other caves.
+    """
+    if all(room in ROOM_POS for room in cave):
+        return ROOM_POS, ROOM_RADIUS
+
+    rooms = sorted(cave)
+    n = len(rooms)
+    cx, cy, spread = WIDTH / 2, (HEIGHT - 100) / 2 + 10, (HEIGHT - 140) / 2
+    radius = max(4, min(ROOM_RADIUS, int(0.4 * spread * math.sqrt(math.pi / n))))
+
+    pos = {}
+    for i, room in enumerate(rooms):
+        r = spread * math.sqrt((i + 0.5) / n)
+        theta = i * GOLDEN_ANGLE
+        pos[room] = (int(cx + r * math.cos(theta)), int(cy + r * math.sin(theta)))
+    return pos, radius
+
+
+@functools.lru_cache(maxsize=1024)
+def render_text(text, color=TEXT_COLOR):
+    """font.render memoized by (text, color)."""
+    return font.render(text, True, color)
+
+
+@functools.lru_cache(maxsize=None)
+def room_sprite(room, color, radius):
+    """A filled, outlined, labelled room circle as a small transparent Surface."""
+    size = 2 * radius + 4
+    sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+    c = size // 2
+    pygame.draw.circle(sprite, color, (c, c), radius)
+    pygame.draw.circle(sprite, (0, 0, 0), (c, c), radius, 2)
+    if radius >= 10:
+        label = render_text(str(room), (0, 0, 0))
+        sprite.blit(label, label.get_rect(center=(c, c)))
+    return sprite
+
+
+def room_topleft(room_pos, room, radius):
+    x, y = room_pos[room]
+    return (int(x) - radius - 2, int(y) - radius - 2)
+
+
+def cave_key(cave):
+    """Content key of a cave graph (room -> neighbor list)."""
+    return tuple((room, tuple(neighbors)) for room, neighbors in sorted(cave.items()))
+
+
+def get_scene(cave):
+    """
+    Background Surface (edges + rooms + labels) for `cave`, built once.
+    The last cave drawn is checked by identity (it is kept referenced, so
+    its id cannot be reused); other caves by content, in a small LRU cache.
+    """
+    if _last_scene["cave"] is cave:
+        return _last_scene["scene"]
+
+    key = cave_key(cave)
+    scene = _scenes.get(key)
+    if scene is not None:
+        _scenes.move_to_end(key)
+    else:
+        room_pos, radius = layout_rooms(cave)
+        background = pygame.Surface((WIDTH, HEIGHT)).convert()
+        background.fill(BG)
+
+        # draw connections
+        for room, neighbors in cave.items():
+            x1, y1 = room_pos[room]
+            for n in neighbors:
+                x2, y2 = room_pos[n]
+                pygame.draw.line(background, EDGE, (x1, y1), (x2, y2), 2)
+
+        # draw rooms
+        for room in cave:
+            background.blit(room_sprite(room, ROOM_COLOR, radius),
+                            room_topleft(room_pos, room, radius))
+
+        scene = (background, room_pos, radius)
+        _scenes[key] = scene
+        if len(_scenes) > MAX_SCENES:
+            _scenes.popitem(last=False)
+
+    _last_scene["cave"] = cave
+    _last_scene["scene"] = scene
+    return scene
+
+
+def frame_items(env, room_pos, radius, message="", status=""):
+    """The dynamic part of a frame as (surface, position) pairs."""
+    items = [(room_sprite(env.player_room, PLAYER_COLOR, radius),
+              room_topleft(room_pos, env.player_room, radius))]
 
     # info line
     info1 = f"Room {env.player_room} | Arrows: {env.arrows} | Steps: {env.step_count}"
-    text1 = font.render(info1, True, TEXT_COLOR)
-    screen.blit(text1, (20, HEIGHT - 80))
+    items.append((render_text(info1), (20, HEIGHT - 80)))
 
     # percepts
     y = HEIGHT - 50
     for p in env.percepts:
-        t = font.render(p, True, TEXT_COLOR)
-        screen.blit(t, (20, y))
+        items.append((render_text(p), (20, y)))
         y -= 24
 
     # extra message (win/lose, episode)
     if message:
-        t_msg = font.render(message, True, (200, 200, 80))
-        screen.blit(t_msg, (20, 20))
-
-    pygame.display.flip()
+        items.append((render_text(message, (200, 200, 80)), (20, 20)))
+
+    # status overlay (live training metrics)
+    if status:
+        items.append((render_text(status), (20, 46)))
+
+    return items
+
+
+def draw_world(env, message="", status=""):
+    background, room_pos, radius = get_scene(env.cave)
+    items = frame_items(env, room_pos, radius, message, status)
+
+    if _frame["scene"] is not background:
+        # new cave (or first frame): full redraw
+        screen.blit(background, (0, 0))
+        for surf, pos in items:
+            screen.blit(surf, pos)
+        pygame.display.flip()
+    else:
+        prev = _frame["items"]
+        rects = [surf.get_rect(topleft=pos) for surf, pos in items]
+        dirty = [surf.get_rect(topleft=pos) for surf, pos in prev if (surf, pos) not in items]
+        dirty += [rect for item, rect in zip(items, rects) if item not in prev]
+
+        # unchanged sprites that overlap a dirty area are redrawn whole, so
+        # their rects become dirty too (until nothing new overlaps); the
+        # background is restored under all of it before anything is drawn,
+        # otherwise antialiased edges would be blended onto themselves
+        redraw = [rect.collidelist(dirty) != -1 for rect in rects]
+        grown = True
+        while grown:
+            grown = False
+            for i, rect in enumerate(rects):
+                if not redraw[i] and rect.collidelist(dirty) != -1:
+                    redraw[i] = grown = True
+                if redraw[i] and rect not in dirty:
+                    dirty.append(rect)
+                    grown = True
+
+        for rect in dirty:
+            screen.blit(background, rect, rect)
+        for (surf, pos), again in zip(items, redraw):
+            if again:
+                screen.blit(surf, pos)
+        if dirty:
+            pygame.display.update(dirty)
+
+    _frame["scene"] = background
+    _frame["items"] = items
 
 
 # --------- Autoplay with trained agent ---------
+def handle_events():
+    """Drain the event queue. Returns False if the window should close."""
+    for event in pygame.event.get():
+        if event.type == pygame.QUIT:
+            return False
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+            return False
+        elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+            _frame["scene"] = None  # window contents lost: full redraw next frame
+    return True
+
+
 def autoplay(env, episodes=3, delay_ms=200):
     running = True
 
@@ -130,12 +301,7 @@ def autoplay(env, episodes=3, delay_ms=200):
         done = False
 
         while not done and running:
-            # Handle quit events
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-                elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
-                    running = False
+            running = handle_events()
 
             draw_world(env, message)
 
@@ -160,7 +326,123 @@ def autoplay(env, episodes=3, delay_ms=200):
             pygame.time.delay(1000)
 
 
+# --------- Live mode: watch a running trainer ---------
+def live_autoplay(env, reader, delay_ms=100, window=50):
+    """
+    Play greedy episodes against the latest Q-table published by a running
+    `q_learning.py --live PATH`. The snapshot is re-read before every episode,
+    so the agent on screen improves as training progresses.
+    """
+    running = True
+    recent_wins = deque(maxlen=window)
+    played = 0
+
+    while running:
+        running = handle_events()
+        snap = reader.snapshot()
+        if snap is None:
+            pygame.time.delay(50)
+            continue
+        q, meta = snap
+
+        state = env.reset()
+        played += 1
+        message = f"Live episode {played}"
+        done = False
+
+        while not done and running:
+            running = handle_events()
+
+            viewer_rate = sum(recent_wins) / len(recent_wins) if recent_wins else 0.0
+            status = (
+                f"Trainer ep {meta['episode']}/{meta['episodes']} | "
+                f"train win {meta['win_rate']*100:.1f}% | "
+                f"viewer win {viewer_rate*100:.1f}% (last {len(recent_wins)})"
+            )
+            draw_world(env, message, status)
+
+            if env.game_over:
+                done = True
+                break
+
+            action = choose_live_action(q, state)
+            state, reward, done, _info = env.step(action)
+
+            pygame.time.delay(delay_ms)
+            clock.tick(60)
+
+        if running:
+            recent_wins.append(1 if env.win else 0)
+            result = "WIN!" if env.win else "LOSE!"
+            draw_world(env, f"Live episode {played} - {result}", status)
+            pygame.time.delay(500)
+
+
+# --------- Replay a recorded episode ---------
+def replay_cave(log, episode):
+    """
+    The cave an episode was recorded in, from its `cave` id: 0 is CAVE,
+    other ids are looked up in the cave table saved next to the log.
+    """
+    cave_id = int(log[episode][0]["cave"])
+    if cave_id == 0:
+        return CAVE
+    from caves import load_log_caves, log_cave_index
+    caves = load_log_caves(log.path)
+    if cave_id not in caves:
+        raise ValueError(f"episode {episode} of {log.path} was played in cave {cave_id}, "
+                         f"which is not listed in {log_cave_index(log.path)}")
+    return caves[cave_id].rooms
+
+
+def replay(log, episode, delay_ms=300):
+    """Play back episode `episode` of a trajectory.TrajectoryLog step by step."""
+    from trajectory import EpisodeReplay
+
+    if not len(log):
+        raise ValueError(f"{log.path} has no recorded episodes")
+    episode = episode % len(log)
+    rec = EpisodeReplay(log, episode, replay_cave(log, episode))
+    message = f"Replay {episode + 1}/{len(log)}"
+    running = True
+
+    while running:
+        running = handle_events()
+        status = f"action {rec.last_action} | reward {rec.last_reward:+.2f} | {rec.last_event}"
+        draw_world(rec, message, status if rec.step_count else "")
+        if rec.game_over:
+            break
+        rec.step()
+        pygame.time.delay(delay_ms)
+        clock.tick(60)
+
+    if running:
+        result = "WIN!" if rec.win else "LOSE!"
+        draw_world(rec, f"{message} - {result}", status)
+        pygame.time.delay(1000)
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Watch the Q-learning agent play.")
+    parser.add_argument("--live", metavar="PATH",
+                        help="attach to a trainer started with `q_learning.py --live PATH`")
+    parser.add_argument("--replay", metavar="PATH",
+                        help="play back an episode from a trajectory log")
+    parser.add_argument("--episode", type=int, default=-1,
+                        help="episode to replay (negative counts from the end)")
+    parser.add_argument("--episodes", type=int, default=3)
+    parser.add_argument("--delay", type=int, default=300, help="delay per step in ms")
+    args = parser.parse_args()
+
     env = WumpusEnv(CAVE, seed=None)
-    autoplay(env, episodes=3, delay_ms=300)
+    if args.live:
+        from live import LiveReader
+        reader = LiveReader(args.live)
+        live_autoplay(env, reader, delay_ms=args.delay)
+        reader.close()
+    elif args.replay:
+        from trajectory import TrajectoryLog
+        replay(TrajectoryLog(args.replay), args.episode, delay_ms=args.delay)
+    else:
+        autoplay(env, episodes=args.episodes, delay_ms=args.delay)
     pygame.quit()
@@ -0,0 +1,232 @@
+import argparse
+
+import numpy as np
+
+from env import N_ACTIONS, MAX_ARROWS, EVENTS, index_state
+from trajectory import TrajectoryLog, KIND_THREAT, KIND_STEP, STATE_FLAGS
+
+
+# --------- Reading transitions ---------
+def state_indices(rooms, arrows, flags):
+    """Vectorized env.state_index() over record columns."""
+    rooms = rooms.astype(np.int64)
+    return ((rooms - 1) * (MAX_ARROWS + 1) + arrows) * 16 + (flags & STATE_FLAGS)
+
+
+def iter_log_transitions(path, chunk_records=1 << 20, rewards=None, cave=None):
+    """
+    Stream (s, a, r, s2, done) arrays from a trajectory log, `chunk_records`
+    records at a time. s and s2 are dense state indices (env.state_index).
+
+    `rewards` optionally maps event names (env.EVENTS) to a replacement
+    reward for steps with that event, e.g. {"win": 10.0, "pit": -10.0}.
+
+    Room numbers only mean something within one cave, so only steps
+    recorded in cave id `cave` are returned. With cave=None the log must
+    hold a single cave; a log from a curriculum run raises ValueError.
+    """
+    records = TrajectoryLog(path).records
+    if cave is None:
+        recorded = np.unique(records["cave"])
+        if len(recorded) > 1:
+            raise ValueError(f"{path} mixes caves {recorded.tolist()}; pick one with cave=")
+    reward_table = None
+    if rewards:
+        unknown = set(rewards) - set(EVENTS)
+        if unknown:
+            raise ValueError(f"Unknown events in rewards: {sorted(unknown)}")
+        reward_table = np.full(len(EVENTS), np.nan)
+        for event, value in rewards.items():
+            reward_table[EVENTS.index(event)] = value
+
+    carry = -1  # index of the last state-bearing record before this chunk
+    for lo in range(0, len(records), chunk_records):
+        hi = min(lo + chunk_records, len(records))
+        kind = np.asarray(records["kind"][lo:hi])
+
+        # position of the latest START/STEP record at or before each record
+        pos = np.where(kind != KIND_THREAT, np.arange(lo, hi), -1)
+        pos = np.maximum.accumulate(np.maximum(pos, carry))
+        prev = np.concatenate(([carry], pos[:-1]))
+        carry = pos[-1]
+
+        steps = np.flatnonzero(kind == KIND_STEP)
+        if cave is not None:
+            steps = steps[np.asarray(records["cave"][lo:hi])[steps] == cave]
+        src = prev[steps]
+        ok = src >= 0  # a log that starts mid-episode has no source state
+        steps, src = steps[ok], src[ok]
+
+        before = records[src]
+        after = np.asarray(records[lo:hi][steps])
+
+        r = after["reward"].astype(np.float64)
+        if reward_table is not None:
+            override = reward_table[after["event"]]
+            r = np.where(np.isnan(override), r, override)
+
+        yield (
+            state_indices(before["room"], before["arrows"], before["flags"]),
+            after["code"].astype(np.int64),
+            r,
+            state_indices(after["room"], after["arrows"], after["flags"]),
+            after["done"].astype(bool),
+        )
+
+
+# --------- Aggregation ---------
+def aggregate_transitions(chunks, n_states):
+    """
+    Reduce a stream of (s, a, r, s2, done) chunks to the distinct
+    (state-action, next state, done) triples with their counts and reward
+    sums. Sweeps then cost O(distinct triples), not O(dataset size).
+    """
+    n_sa = n_states * N_ACTIONS
+    keys_acc, count_acc, rsum_acc = [], [], []
+
+    def reduce(keys, counts, rsums):
+        uniq, inv = np.unique(keys, return_inverse=True)
+        return (uniq,
+                np.bincount(inv, weights=counts, minlength=len(uniq)),
+                np.bincount(inv, weights=rsums, minlength=len(uniq)))
+
+    for s, a, r, s2, done in chunks:
+        if np.any(s >= n_states) or np.any(s2 >= n_states):
+            raise ValueError("state index out of range: n_states too small for this log")
+        keys = ((s * N_ACTIONS + a) * n_states + s2) * 2 + done
+        keys_acc.append(keys)
+        count_acc.append(np.ones(len(keys)))
+        rsum_acc.append(r)
+
+        if sum(len(k) for k in keys_acc) > 4 * (1 << 20):
+            keys, counts, rsums = reduce(np.concatenate(keys_acc),
+                                         np.concatenate(count_acc),
+                                         np.concatenate(rsum_acc))
+            keys_acc, count_acc, rsum_acc = [keys], [counts], [rsums]
+
+    if keys_acc:
+        keys, counts, rsums = reduce(np.concatenate(keys_acc),
+                                     np.concatenate(count_acc),
+                                     np.concatenate(rsum_acc))
+    else:
+        keys, counts, rsums = np.zeros(0, np.int64), np.zeros(0), np.zeros(0)
+
+    done = (keys % 2).astype(bool)
+    rest = keys // 2
+    return {
+        "n_states": n_states,
+        "sa": rest // n_states,
+        "s2": rest % n_states,
+        "done": done,
+        "count": counts,
+        "reward_sum": rsums,
+        "n_sa": n_sa,
+    }
+
+
+# --------- Fitted Q iteration ---------
+def fitted_q_iteration(data, gamma=0.95, tol=1e-6, max_iters=1000, verbose=True):
+    """
+    Batch Q-value backups over the whole dataset until the largest change
+    falls below `tol`:
+
+      Q(s,a) <- mean over logged (s,a) transitions of r + gamma * max_a' Q(s',a')
+
+    Each sweep is a grouped reduction (np.bincount by state-action index).
+    With a tabular Q this is value iteration on the empirical MDP, i.e. the
+    fixed point fitted Q iteration converges to. Unvisited actions keep
+    Q = 0, matching the default of q_learn's get_q.
+
+    Returns (q, visited) with q of shape (n_states, N_ACTIONS).
+    """
+    n_sa = data["n_sa"]
+    sa, s2 = data["sa"], data["s2"]
+    count = data["count"]
+    live = count * ~data["done"]
+
+    visits = np.bincount(sa, weights=count, minlength=n_sa)
+    visited = visits > 0
+    safe_visits = np.where(visited, visits, 1.0)
+    mean_reward = np.bincount(sa, weights=data["reward_sum"], minlength=n_sa) / safe_visits
+
+    q = np.zeros(n_sa)
+    it, delta = 0, float("inf")
+    for it in range(1, max_iters + 1):
+        v = q.reshape(-1, N_ACTIONS).max(axis=1)
+        backup = np.bincount(sa, weights=live * v[s2], minlength=n_sa) / safe_visits
+        new_q = np.where(visited, mean_reward + gamma * backup, 0.0)
+        delta = np.abs(new_q - q).max() if n_sa else 0.0
+        q = new_q
+        if delta < tol:
+            break
+
+    if verbose:
+        print(f"FQI: {it} sweeps, max |dQ| = {delta:.2e}, "
+              f"{int(visited.sum())} state-action pairs, {int(count.sum())} transitions")
+    return q.reshape(-1, N_ACTIONS), visited.reshape(-1, N_ACTIONS)
+
+
+def q_array_to_dict(q, visited):
+    """Dense Q array -> Q[(state, action)] dict (visited entries only), for save_q_table."""
+    Q = {}
+    for idx, action in zip(*np.nonzero(visited)):
+        Q[(index_state(int(idx)), int(action))] = float(q[idx, action])
+    return Q
+
+
+def learn_from_logs(paths, n_states, gamma=0.95, rewards=None, tol=1e-6, max_iters=1000,
+                    chunk_records=1 << 20, cave=None):
+    """Stream one or more trajectory logs (steps in cave id `cave`) and return a Q dict."""
+    chunks = (chunk for path in paths
+              for chunk in iter_log_transitions(path, chunk_records, rewards, cave))
+    data = aggregate_transitions(chunks, n_states)
+    q, visited = fitted_q_iteration(data, gamma, tol, max_iters)
+    return q_array_to_dict(q, visited)
+
+
+def _parse_reward(text):
+    event, _, value = text.partition("=")
+    return event, float(value)
+
+
+if __name__ == "__main__":
+    from env import CAVE, state_space_size
+    from q_learning import save_q_table
+
+    parser = argparse.ArgumentParser(description="Offline Q-learning from recorded trajectory logs.")
+    parser.add_argument("logs", nargs="+", help="trajectory logs from q_learning.py --record")
+    parser.add_argument("--gamma", type=float, default=0.95)
+    parser.add_argument("--tol", type=float, default=1e-6)
+    parser.add_argument("--max-iters", type=int, default=1000)
+    parser.add_argument("--reward", action="append", type=_parse_reward, default=[],
+                        metavar="EVENT=VALUE", help="override the reward of steps with EVENT")
+    parser.add_argument("--cave", type=int, default=None,
+                        help="learn from the steps recorded in this cave id (required for "
+                             "logs of q_learning.py --caves runs)")
+    parser.add_argument("--out", default="q_table.json")
+    args = parser.parse_args()
+
+    n_states = state_space_size(len(CAVE))
+    if args.cave:
+        from caves import load_log_caves
+        caves = load_log_caves(args.logs[0])
+        if args.cave not in caves:
+            parser.error(f"cave {args.cave} is not listed for {args.logs[0]}")
+        n_states = caves[args.cave].n_states()
+
+    try:
+        Q = learn_from_logs(args.logs, n_states, gamma=args.gamma, rewards=dict(args.reward),
+                            tol=args.tol, max_iters=args.max_iters, cave=args.cave)
+    except ValueError as err:
+        message = str(err)
+        if args.cave is None:
+            # e.g. a curriculum log: name the caves --cave can pick from
+            from caves import load_log_caves
+            listed = {}
+            for path in args.logs:
+                listed.update(load_log_caves(path))
+            if listed:
+                message += "\n--cave choices: " + ", ".join(
+                    f"{cave_id} ({cave.name})" for cave_id, cave in sorted(listed.items()))
+        parser.error(message)
+    save_q_table(Q, args.out)
@@ -1,8 +1,12 @@
+import argparse
 import json
-import random
-import matplotlib.pyplot as plt
 
-from env import WumpusEnv, CAVE
+import numpy as np
+
+import analytics
+
+from env import WumpusEnv, CAVE, state_space_size
+from rng import BlockRNG
 
 
 def q_learn(env,
@@ -10,60 +14,160 @@ def q_learn(env,
             alpha=0.1,
             gamma=0.95,
             epsilon_start=1.0,
-            epsilon_end=0.05):
+            epsilon_end=0.05,
+            publisher=None,
+            publish_every=500,
+            recorder=None,
+            method="q",
+            lam=0.9,
+            monitor=None,
+            visits=None,
+            curriculum=None,
+            rng=None,
+            decay_episodes=None):
     """
     Tabular Q-learning.
     Q[(state, action)] -> value
 
       state = (room, arrows, wumpus_alive, smell, rustle, breeze)
       action in [0..5]
+
+    method:
+      "q"        one-step Q-learning
+      "watkins"  Watkins' Q(lambda): traces are cut after exploratory actions
+      "sarsa"    SARSA(lambda), on-policy
+    The lambda methods keep replacing eligibility traces only for the
+    state-action pairs visited this episode, so each step costs
+    O(active traces) rather than O(table).
+
+    If a convergence.ConvergenceMonitor is given, training stops as soon as
+    it reports convergence; its report() says why training ended. Epsilon
+    decays linearly over the first `decay_episodes` episodes (default: all
+    of them), and the monitor only judges windows after that. When it asks
+    for evaluation episodes, they are played greedily (no exploration, no
+    UCB bonus) in the current cave, without learning or recording.
+
+    If a visits.VisitCounts is given, every update is counted per
+    (state, action); its step size replaces `alpha` when visits.omega is
+    set, and its UCB bonus is added to Q during greedy selection when
+    visits.ucb_c > 0.
+
+    If a caves.Curriculum is given, each episode is played in the cave it
+    schedules for that episode (switching is a reference swap on env), and
+    the recorder's cave id follows the current cave.
+
+    Exploration and tie-breaking draw from `rng`, a rng.BlockRNG
+    (reproducible per seed); by default an unseeded one.
+
+    If a live.LivePublisher is given, the Q-table and recent metrics are
+    published to it every `publish_every` episodes (and once at the end).
+    If a trajectory.TrajectoryWriter is given, every episode is logged to it.
     """
+    if method not in ("q", "watkins", "sarsa"):
+        raise ValueError(f"Unknown method {method!r}, expected 'q', 'watkins' or 'sarsa'")
+
     Q = {}
     actions = list(range(6))
+    if decay_episodes is None:
+        decay_episodes = episodes
+
+    # Sparse eligibility traces: slots 0..n_active-1 of trace_keys/trace_vals
+    # are live; trace_slot maps (state, action) -> slot.
+    trace_cap = max(1, env.max_steps)
+    trace_keys = [None] * trace_cap
+    trace_vals = [0.0] * trace_cap
+    trace_alpha = [alpha] * trace_cap
+    trace_slot = {}
 
     def get_q(s, a):
         return Q.get((s, a), 0.0)
 
-    def best_action(s):
+    use_bonus = visits is not None and visits.ucb_c > 0
+
+    if rng is None:
+        rng = BlockRNG()
+    uniform = rng.random
+    random_action = rng.integers(len(actions))
+
+    def best_action(s, bonus=use_bonus):
         qs = [get_q(s, a) for a in actions]
+        if bonus:
+            qs = [q + b for q, b in zip(qs, visits.bonus(s).tolist())]
         max_q = max(qs)
         # Break ties randomly
         candidates = [a for a, q in zip(actions, qs) if q == max_q]
-        return random.choice(candidates)
+        if len(candidates) == 1:
+            return candidates[0]
+        return candidates[int(uniform() * len(candidates))]
+
+    def choose(s, epsilon):
+        # epsilon-greedy
+        if uniform() < epsilon:
+            return random_action()
+        return best_action(s)
+
+    def greedy_win_rate(n):
+        wins = 0
+        for _ in range(n):
+            s = env.reset()
+            done = False
+            while not done:
+                s, _r, done, _info = env.step(best_action(s, False))
+            wins += env.win
+        return wins / n
 
     episode_rewards = []
     episode_wins = []
 
+    cave = None
     for ep in range(episodes):
+        if curriculum is not None and curriculum.cave_for(ep) is not cave:
+            cave = curriculum.cave_for(ep)
+            cave.apply(env)
+            if recorder is not None:
+                recorder.cave_id = cave.cave_id
+
         state = env.reset()
         done = False
         total_reward = 0.0
+        if recorder is not None:
+            recorder.start_episode(env)
 
         # Linear epsilon decay
-        frac = ep / max(1, episodes - 1)
+        frac = min(1.0, ep / max(1, decay_episodes - 1))
         epsilon = epsilon_start + frac * (epsilon_end - epsilon_start)
 
-        while not done:
-            # epsilon-greedy
-            if random.random() < epsilon:
-                action = random.choice(actions)
-            else:
-                action = best_action(state)
+        if method == "q":
+            while not done:
+                action = choose(state, epsilon)
 
-            next_state, reward, done, _info = env.step(action)
+                next_state, reward, done, info = env.step(action)
+                if recorder is not None:
+                    recorder.record_step(env, action, reward, next_state, done, info)
 
-            old_q = get_q(state, action)
-            max_next = max(get_q(next_state, a) for a in actions)
-            target = reward + (0.0 if done else gamma * max_next)
-            new_q = old_q + alpha * (target - old_q)
-            Q[(state, action)] = new_q
+                old_q = get_q(state, action)
+                max_next = max(get_q(next_state, a) for a in actions)
+                target = reward + (0.0 if done else gamma * max_next)
+                step = alpha if visits is None else visits.visit(state, action, alpha)
+                new_q = old_q + step * (target - old_q)
+                Q[(state, action)] = new_q
+                if monitor is not None:
+                    monitor.record_td(target - old_q)
 
-            state = next_state
-            total_reward += reward
+                state = next_state
+                total_reward += reward
+        else:
+            total_reward = _lambda_episode(
+                env, state, Q, get_q, choose, actions, alpha, gamma, lam,
+                epsilon, method == "watkins", recorder, monitor, visits,
+                trace_keys, trace_vals, trace_alpha, trace_slot,
+            )
 
         # Episode finished
         episode_rewards.append(total_reward)
         episode_wins.append(1 if env.win else 0)
+        converged = monitor is not None and monitor.end_episode(
+            episode_wins[-1], Q, greedy_win_rate, exploring=frac < 1.0)
 
         # Console progress
         if (ep + 1) % 500 == 0:
@@ -78,9 +182,97 @@ def q_learn(env,
                 f"win rate(last {recent}): {avg_w*100:.1f}%"
             )
 
+        # Live snapshot for the viewer
+        if publisher is not None and ((ep + 1) % publish_every == 0 or ep + 1 == episodes
+                                      or converged):
+            r_slice = episode_rewards[-publish_every:]
+            w_slice = episode_wins[-publish_every:]
+            publisher.publish(
+                Q, ep + 1, episodes,
+                win_rate=sum(w_slice) / len(w_slice),
+                avg_reward=sum(r_slice) / len(r_slice),
+                epsilon=epsilon,
+            )
+
+        if converged:
+            break
+
+    if monitor is not None:
+        print(monitor.report())
+
     return Q, episode_rewards, episode_wins
 
 
+def _lambda_episode(env, state, Q, get_q, choose, actions, alpha, gamma, lam,
+                    epsilon, watkins, recorder, monitor, visits,
+                    trace_keys, trace_vals, trace_alpha, trace_slot):
+    """
+    Run one episode of Watkins' Q(lambda) (watkins=True) or SARSA(lambda)
+    from `state`, updating Q in place. Returns the episode reward.
+
+    With visit counts, each traced pair is updated with the step size from
+    its most recent visit.
+    """
+    trace_slot.clear()
+    n_active = 0
+    decay = gamma * lam
+    total_reward = 0.0
+
+    action = choose(state, epsilon)
+    done = False
+    while not done:
+        next_state, reward, done, info = env.step(action)
+        if recorder is not None:
+            recorder.record_step(env, action, reward, next_state, done, info)
+        total_reward += reward
+
+        greedy = True
+        if done:
+            target = reward
+        else:
+            # pick the next action now: SARSA bootstraps from it, Watkins
+            # needs to know whether it is greedy
+            next_action = choose(next_state, epsilon)
+            max_next = max(get_q(next_state, a) for a in actions)
+            next_q = get_q(next_state, next_action)
+            greedy = next_q == max_next
+            target = reward + gamma * (max_next if watkins else next_q)
+
+        key = (state, action)
+        delta = target - get_q(state, action)
+        if monitor is not None:
+            monitor.record_td(delta)
+
+        # replacing trace for the current pair
+        slot = trace_slot.get(key)
+        if slot is None:
+            if n_active == len(trace_keys):
+                trace_keys.extend([None] * n_active)
+                trace_vals.extend([0.0] * n_active)
+                trace_alpha.extend([alpha] * n_active)
+            slot = n_active
+            n_active += 1
+            trace_keys[slot] = key
+            trace_slot[key] = slot
+        trace_vals[slot] = 1.0
+        trace_alpha[slot] = alpha if visits is None else visits.visit(state, action, alpha)
+
+        for i in range(n_active):
+            k = trace_keys[i]
+            Q[k] = Q.get(k, 0.0) + trace_alpha[i] * delta * trace_vals[i]
+            trace_vals[i] *= decay
+
+        if watkins and not greedy:
+            # exploratory action: earlier pairs get no credit for what follows
+            trace_slot.clear()
+            n_active = 0
+
+        if not done:
+            state, action = next_state, next_action
+
+    return total_reward
+
+
 def save_q_table(Q, path="q_table.json"):
     """
     Convert Q[(state, action)] -> JSON-friendly dict:
@@ -107,63 +299,135 @@ def save_q_table(Q, path="q_table.json"):
 
 
 def moving_average(data, window):
-    if window <= 1:
-        return data[:]
-    out = []
-    cumsum = 0.0
-    for i, v in enumerate(data):
-        cumsum += v
-        if i >= window:
-            cumsum -= data[i - window]
-            out.append(cumsum / window)
-        else:
-            out.append(cumsum / (i + 1))
-    return out
+    return analytics.rolling_mean(data, window).tolist()
 
 
 def plot_training(rewards, wins, window=100, out_prefix="training"):
-    episodes = list(range(1, len(rewards) + 1))
-    ma_rewards = moving_average(rewards, window)
-    ma_wins = moving_average(wins, window)
-
-    # ----- Reward plot -----
-    plt.figure()
-    plt.plot(episodes, rewards, alpha=0.3)
-    plt.plot(episodes, ma_rewards)
-    plt.xlabel("Episode")
-    plt.ylabel("Episode reward")
-    plt.title(f"Episode Reward (moving avg window={window})")
-    plt.tight_layout()
-    reward_path = f"{out_prefix}_reward.png"
-    plt.savefig(reward_path)
-    plt.close()
-    print(f"Saved reward plot to {reward_path}")
-
-    # ----- Win-rate plot -----
-    plt.figure()
-    plt.plot(episodes, ma_wins)
-    plt.xlabel("Episode")
-    plt.ylabel("Win rate (moving avg)")
-    plt.title(f"Win Rate (moving avg window={window})")
-    plt.tight_layout()
-    win_path = f"{out_prefix}_winrate.png"
-    plt.savefig(win_path)
-    plt.close()
-    print(f"Saved win-rate plot to {win_path}")
+    data = np.column_stack((rewards, wins)) if len(rewards) else np.zeros((0, 2))
+    analytics.plot_training(data, window=window, out_prefix=out_prefix)
 
 
 if __name__ == "__main__":
-    env = WumpusEnv(CAVE, seed=None)
+    parser = argparse.ArgumentParser(description="Train a Q-learning agent for Hunt the Wumpus.")
+    parser.add_argument("--episodes", type=int, default=5000)
+    parser.add_argument("--method", choices=("q", "watkins", "sarsa"), default="q")
+    parser.add_argument("--lam", type=float, default=0.9, help="trace decay for watkins/sarsa")
+    parser.add_argument("--omega", type=float, default=None,
+                        help="per-entry step size 1/n**omega from visit counts instead of a fixed alpha")
+    parser.add_argument("--ucb", type=float, default=0.0,
+                        help="count-based exploration bonus weight for greedy selection")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="save per-episode rewards and wins (.npy) for analytics.py")
+    parser.add_argument("--stop-td", type=float, default=None,
+                        help="stop when mean |TD error| per window is below this")
+    parser.add_argument("--stop-td-max", type=float, default=None,
+                        help="stop when max |TD error| per window is below this")
+    parser.add_argument("--stop-policy", type=float, default=None,
+                        help="stop when the fraction of changed greedy actions per window is below this")
+    parser.add_argument("--stop-win", type=float, default=None,
+                        help="stop when the win rate moves less than this between windows")
+    parser.add_argument("--patience", type=int, default=3,
+                        help="consecutive windows the stop thresholds must hold")
+    parser.add_argument("--stop-window", type=int, default=500,
+                        help="episodes per convergence window")
+    parser.add_argument("--min-episodes", type=int, default=0,
+                        help="never stop before this many episodes")
+    parser.add_argument("--decay-episodes", type=int, default=None,
+                        help="episodes over which epsilon decays (default: all); "
+                             "the stop thresholds are only checked after that")
+    parser.add_argument("--eval-episodes", type=int, default=0,
+                        help="greedy episodes per window measuring the win rate for --stop-win "
+                             "(0: use the epsilon-greedy training win rate)")
+    parser.add_argument("--live", metavar="PATH",
+                        help="publish Q-table snapshots to PATH for `main.py --live PATH`")
+    parser.add_argument("--publish-every", type=int, default=500)
+    parser.add_argument("--record", metavar="PATH",
+                        help="append every training episode to a trajectory log")
+    parser.add_argument("--caves", nargs="+", metavar="SPEC",
+                        help="train on a curriculum of caves, smallest first; SPEC is "
+                             "PATH[,max_steps=N][,bats=N][,pits=N]")
+    parser.add_argument("--stage-episodes", type=int, default=1000,
+                        help="episodes per cave with --caves")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed block-drawn random streams for the env and the agent")
+    args = parser.parse_args()
+
+    agent_rng = None
+    if args.seed is not None:
+        env_rng, agent_rng = BlockRNG(args.seed).spawn(2)
+        env = WumpusEnv(CAVE, rng=env_rng)
+    else:
+        env = WumpusEnv(CAVE, seed=None)
+    n_states = state_space_size(len(CAVE))
+
+    curriculum = None
+    if args.caves:
+        from caves import CaveRegistry, Curriculum, parse_cave_spec, log_cave_index
+        # with --record, cave ids are kept next to the log for replay/offline.py
+        registry = CaveRegistry(ids_path=log_cave_index(args.record) if args.record else None)
+        for spec in args.caves:
+            path, options = parse_cave_spec(spec)
+            registry.register(path, **options)
+        if args.record:
+            registry.save_ids()
+        curriculum = Curriculum.by_size(registry, args.stage_episodes)
+        n_states = curriculum.max_states()
+        print("Curriculum:")
+        print(curriculum.describe())
+
+    publisher = None
+    if args.live:
+        from live import LivePublisher
+        # main.py --live plays in CAVE, so the table must cover it even when
+        # the curriculum only has smaller caves
+        publisher = LivePublisher(args.live, max(n_states, state_space_size(len(CAVE))))
+
+    monitor = None
+    if any(t is not None for t in (args.stop_td, args.stop_td_max, args.stop_policy, args.stop_win)):
+        from convergence import ConvergenceMonitor
+        monitor = ConvergenceMonitor(window=args.stop_window, td_max=args.stop_td_max,
+                                     td_mean=args.stop_td, policy_change=args.stop_policy,
+                                     win_rate_delta=args.stop_win, patience=args.patience,
+                                     min_episodes=args.min_episodes,
+                                     eval_episodes=args.eval_episodes if args.stop_win is not None else 0)
+
+    visits = None
+    if args.omega is not None or args.ucb > 0:
+        from visits import VisitCounts
+        visits = VisitCounts(n_states, omega=args.omega, ucb_c=args.ucb)
+
+    recorder = None
+    if args.record:
+        from trajectory import TrajectoryWriter
+        recorder = TrajectoryWriter(args.record)
 
     print("Training Q-learning agent...")
     Q, rewards, wins = q_learn(
         env,
-        episodes=5000,
+        episodes=args.episodes,
         alpha=0.1,
         gamma=0.95,
         epsilon_start=1.0,
         epsilon_end=0.05,
+        publisher=publisher,
+        publish_every=args.publish_every,
+        recorder=recorder,
+        method=args.method,
+        lam=args.lam,
+        monitor=monitor,
+        visits=visits,
+        curriculum=curriculum,
+        rng=agent_rng,
+        decay_episodes=args.decay_episodes,
     )
+    if publisher is not None:
+        publisher.close()
+    if recorder is not None:
+        recorder.close()
+    if visits is not None:
+        print(visits.coverage_report())
 
     save_q_table(Q, "q_table.json")
+    if args.metrics:
+        analytics.save_metrics(args.metrics, rewards, wins)
     plot_training(rewards, wins, window=100, out_prefix="training")
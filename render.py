@@ -0,0 +1,155 @@
+import argparse
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Render offscreen: must be set before pygame (via main) is imported.
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import cv2
+
+from env import WumpusEnv, CAVE
+
+FORMATS = ("mp4", "gif", "png")
+
+
+# --------- Frame capture ---------
+def record_episode(env, hold_frames=5, message=""):
+    """
+    Play one greedy episode with main.choose_best_action and return its
+    frames as a list of (H, W, 3) uint8 RGB arrays. No wall-clock delays:
+    the final result frame is repeated `hold_frames` times instead of the
+    1 s pause autoplay uses.
+    """
+    import main
+    import pygame
+
+    frames = []
+    state = env.reset()
+    done = False
+    while not done:
+        main.draw_world(env, message)
+        frames.append(pygame.surfarray.array3d(main.screen).transpose(1, 0, 2))
+        if env.game_over:
+            break
+        action = main.choose_best_action(state)
+        state, reward, done, _info = env.step(action)
+
+    result = "WIN!" if env.win else "LOSE!"
+    main.draw_world(env, f"{message} - {result}" if message else result)
+    last = pygame.surfarray.array3d(main.screen).transpose(1, 0, 2)
+    frames.extend([last] * hold_frames)
+    return frames
+
+
+# --------- Encoders ---------
+def save_mp4(frames, path, fps=5):
+    h, w = frames[0].shape[:2]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (w, h))
+    for frame in frames:
+        writer.write(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+    writer.release()
+    return path
+
+
+def save_gif(frames, path, fps=5):
+    try:
+        from PIL import Image
+    except ImportError:
+        raise ImportError("GIF output needs Pillow: pip install pillow")
+    images = [Image.fromarray(frame) for frame in frames]
+    images[0].save(path, save_all=True, append_images=images[1:],
+                   duration=int(1000 / fps), loop=0, optimize=False)
+    return path
+
+
+def save_png_sequence(frames, out_dir):
+    os.makedirs(out_dir, exist_ok=True)
+    for i, frame in enumerate(frames):
+        cv2.imwrite(os.path.join(out_dir, f"frame_{i:04d}.png"),
+                    cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+    return out_dir
+
+
+def save_frames(frames, path, fmt, fps=5):
+    """Encode frames to `path` as mp4, gif or a png directory."""
+    if fmt == "mp4":
+        return save_mp4(frames, path, fps)
+    elif fmt == "gif":
+        return save_gif(frames, path, fps)
+    elif fmt == "png":
+        return save_png_sequence(frames, path)
+    raise ValueError(f"Unknown format {fmt!r}, expected one of {FORMATS}")
+
+
+# --------- Batch rendering ---------
+def _load_q_table(q_table_path):
+    import main
+    if q_table_path is not None:
+        with open(q_table_path, "r") as f:
+            main.Q_TABLE = json.load(f)
+
+
+def render_episodes(episode_ids, out_dir, fmt="mp4", seed=0, fps=5,
+                    q_table_path=None, encode_threads=2):
+    """
+    Render the given episode ids in this process. Episode `i` uses seed
+    `seed + i` for both the environment and tie-breaking, so any episode can
+    be reproduced on its own. Encoding runs in a thread pool while the next
+    episode is being recorded. Returns the output paths.
+    """
+    _load_q_table(q_table_path)
+    os.makedirs(out_dir, exist_ok=True)
+    ext = "" if fmt == "png" else f".{fmt}"
+
+    with ThreadPoolExecutor(max_workers=encode_threads) as pool:
+        jobs = []
+        for i in episode_ids:
+            random.seed(seed + i)
+            env = WumpusEnv(CAVE, seed=seed + i)
+            frames = record_episode(env, hold_frames=fps, message=f"Episode {i}")
+            path = os.path.join(out_dir, f"episode_{i:05d}{ext}")
+            jobs.append(pool.submit(save_frames, frames, path, fmt, fps))
+        return [job.result() for job in jobs]
+
+
+def render_batch(episodes, out_dir, fmt="mp4", seed=0, fps=5,
+                 q_table_path=None, processes=None):
+    """
+    Render `episodes` episodes split round-robin across worker processes,
+    each with its own offscreen pygame display.
+    """
+    processes = processes or os.cpu_count() or 1
+    processes = max(1, min(processes, episodes))
+    chunks = [list(range(p, episodes, processes)) for p in range(processes)]
+
+    if processes == 1:
+        return render_episodes(chunks[0], out_dir, fmt, seed, fps, q_table_path)
+
+    paths = []
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        jobs = [pool.submit(render_episodes, chunk, out_dir, fmt, seed, fps, q_table_path)
+                for chunk in chunks]
+        for job in jobs:
+            paths.extend(job.result())
+    return sorted(paths)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render greedy episodes to video without a display.")
+    parser.add_argument("--episodes", type=int, default=4)
+    parser.add_argument("--out", default="renders")
+    parser.add_argument("--format", choices=FORMATS, default="mp4")
+    parser.add_argument("--fps", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--q-table", default=None,
+                        help="Q-table JSON to play (default: main.py's q_table.json)")
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    paths = render_batch(args.episodes, args.out, args.format, args.seed, args.fps,
+                         args.q_table, args.processes)
+    for path in paths:
+        print(f"Saved {path}")
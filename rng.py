@@ -0,0 +1,65 @@
+import itertools
+import pickle
+
+import numpy as np
+
+BLOCK = 1 << 16
+
+
+class BlockRNG:
+    """
+    Random stream that draws from a NumPy Generator in blocks of `block`
+    values and hands them out one at a time.
+
+    random() is the bound __next__ of an iterator over the converted
+    blocks, and refills happen in C once per block. A draw is not cheaper
+    than the stdlib random.random() (see benchmark.py --rng); what this
+    adds is seeded, independent streams built on NumPy's SeedSequence. Use
+    integers(n) for a stream of ints in [0, n) drawn the same way (e.g.
+    random actions).
+
+    The same seed always gives the same values. spawn() derives independent
+    child streams through SeedSequence, one per worker, environment or
+    agent; it does not consume values from this stream.
+
+    A stream pickles as its SeedSequence, so spawned streams can be sent to
+    process pools. Only streams nothing has been drawn from can be
+    pickled: the buffered position cannot be carried over.
+
+    random() matches random.Random.random, the only method WumpusEnv uses,
+    so a BlockRNG can be passed as WumpusEnv(rng=...). There is no choice():
+    callers index with seq[int(random() * len(seq))] and skip a Python-level
+    method call per draw.
+    """
+
+    def __init__(self, seed=None, block=BLOCK):
+        if isinstance(seed, np.random.SeedSequence):
+            self.seed_seq = seed
+        else:
+            self.seed_seq = np.random.SeedSequence(seed)
+        self.block = block
+        self.generator = np.random.default_rng(self.seed_seq)
+        self._fresh_state = self.generator.bit_generator.state
+        self.random = itertools.chain.from_iterable(self._uniform_blocks()).__next__
+
+    def __reduce__(self):
+        if self.generator.bit_generator.state != self._fresh_state:
+            raise pickle.PicklingError("BlockRNG can only be pickled before its first draw; "
+                                       "pickle a spawn()ed stream instead")
+        return BlockRNG, (self.seed_seq, self.block)
+
+    def _uniform_blocks(self):
+        while True:
+            yield self.generator.random(self.block).tolist()
+
+    def _integer_blocks(self, n):
+        while True:
+            yield self.generator.integers(0, n, self.block).tolist()
+
+    def integers(self, n):
+        """A draw function returning ints in [0, n), backed by its own blocks."""
+        return itertools.chain.from_iterable(self._integer_blocks(n)).__next__
+
+    def spawn(self, n):
+        """`n` independent child streams."""
+        return [BlockRNG(child, self.block) for child in self.seed_seq.spawn(n)]
@@ -185,7 +185,9 @@ def convert_matrix_to_q_table(current_location, q_table, size):
   return q_table_location
 
 
-def q_learning(player, wumpus, holes, bats, state_number = 8,size=size, alpha=alpha, epsilon=epsilon, gamma=gamma, training_number=training_number, max_tries=max_tries):
+#display=False skips the cv2 windows and waits so training can run headless,
+#frames (a list) collects every rendered world image as RGB (create_world draws BGR), e.g. for render.save_frames
+def q_learning(player, wumpus, holes, bats, state_number = 8,size=size, alpha=alpha, epsilon=epsilon, gamma=gamma, training_number=training_number, max_tries=max_tries, display=True, frames=None):
   rewards = []
   q_table = q_table_init(size)
   number = 1
@@ -242,9 +244,13 @@ def q_learning(player, wumpus, holes, bats, state_number = 8,size=size, alpha=al
       q_table_location = convert_matrix_to_q_table(player.current_location, q_table, size)
       q_table_location_new = convert_matrix_to_q_table(new_location, q_table, size)
       q_table[q_table_location][action_taken] = (1 - alpha) * q_table[q_table_location][action_taken] + alpha * (new_reward + gamma * max(q_table[q_table_location_new]))
-      img = create_world(player.current_location, wumpus.current_location, holes.locations, bats.locations)
-      cv2.imshow("Game", img)
-      cv2.waitKey(500)
+      if display or frames is not None:
+        img = create_world(player.current_location, wumpus.current_location, holes.locations, bats.locations)
+        if frames is not None:
+          frames.append(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+        if display:
+          cv2.imshow("Game", img)
+          cv2.waitKey(500)
       if new_location == wumpus.current_location or new_location in holes.locations:
         #start a new run if you died
         print("you died")
@@ -260,12 +266,163 @@ def q_learning(player, wumpus, holes, bats, state_number = 8,size=size, alpha=al
       else:
         player.current_location = new_location
     print("Run Done")
-    cv2.waitKey(0)
-    cv2.destroyAllWindows()
+    if display:
+      cv2.waitKey(0)
+      cv2.destroyAllWindows()
     rewards.append(reward)
     number = number + 1
   return rewards, q_table
 
+#cell codes used by create_map and the generate_* functions
+EMPTY, START, BAT, WUMPUS, HOLE = -1, 0, -50, -100, -200
+#row/column offsets of actions 0..3 (and of the shots 4..7)
+ACTION_ROWS = np.array([-1, 1, 0, 0])
+ACTION_COLS = np.array([0, 0, -1, 1])
+
+class GridWumpusBatch:
+  #Many independent size x size maps stepped together with NumPy.
+  #grid[i] holds map i in the create_map codes (-1 empty, 0 start, -50 bats,
+  #-100 wumpus, -200 hole); player, wumpus and arrows are per-map arrays, so
+  #nothing is shared between maps (unlike the Player/Wumpus/Hole/Bats classes).
+  #Rewards follow q_learning: a move earns the code of the cell entered
+  #(-200 for walking into a wall), a shot +shoot_score on a hit and -500 on a miss.
+  def __init__(self, n_maps, size=size, holes=2, bats=2, arrows=10, max_tries=max_tries, seed=None):
+    self.n_maps = n_maps
+    self.size = size
+    self.holes = holes
+    self.bats = bats
+    self.start_arrows = arrows
+    self.max_tries = max_tries
+    self.rng = np.random.default_rng(seed)
+    self.grid = np.full((n_maps, size, size), EMPTY, dtype=np.int16)
+    self.player = np.zeros((n_maps, 2), dtype=np.int64)
+    self.wumpus = np.zeros((n_maps, 2), dtype=np.int64)
+    self.arrows = np.zeros(n_maps, dtype=np.int64)
+    self.tries = np.zeros(n_maps, dtype=np.int64)
+    self.done = np.ones(n_maps, dtype=bool)
+    self.maps = np.arange(n_maps)
+    self.reset()
+
+  #new random maps for the selected maps (all maps by default), returns all states
+  def reset(self, which=None):
+    which = self.maps if which is None else self.maps[which]
+    n = len(which)
+    cells = self.size * self.size
+    #distinct cells per map: player, wumpus, holes, bats
+    picks = self.rng.random((n, cells)).argsort(axis=1)[:, :2 + self.holes + self.bats]
+    codes = np.array([START, WUMPUS] + [HOLE] * self.holes + [BAT] * self.bats, dtype=np.int16)
+    flat = np.full((n, cells), EMPTY, dtype=np.int16)
+    flat[np.arange(n)[:, None], picks] = codes
+    self.grid[which] = flat.reshape(n, self.size, self.size)
+    self.player[which] = np.column_stack(np.divmod(picks[:, 0], self.size))
+    self.wumpus[which] = np.column_stack(np.divmod(picks[:, 1], self.size))
+    self.arrows[which] = self.start_arrows
+    self.tries[which] = 0
+    self.done[which] = False
+    return self.states()
+
+  #q table row of every map, like convert_matrix_to_q_table
+  def states(self):
+    return self.player[:, 0] * self.size + self.player[:, 1]
+
+  #take one action (0..7) per map; maps that are already done are left as they are
+  #returns states, rewards, done, hit
+  def step(self, actions):
+    actions = np.asarray(actions)
+    live = ~self.done
+    rewards = np.zeros(self.n_maps)
+    row, col = self.player[:, 0], self.player[:, 1]
+
+    #moves
+    move = live & (actions < 4)
+    direction = actions % 4
+    new_row = row + ACTION_ROWS[direction]
+    new_col = col + ACTION_COLS[direction]
+    inside = (new_row >= 0) & (new_row < self.size) & (new_col >= 0) & (new_col < self.size)
+    rewards[move & ~inside] = -200  #wall, like action_take
+    go = move & inside
+    new_row, new_col = new_row[go], new_col[go]
+    entered = self.grid[self.maps[go], new_row, new_col]
+    rewards[go] = entered
+    self.player[go, 0] = new_row
+    self.player[go, 1] = new_col
+    died = np.zeros(self.n_maps, dtype=bool)
+    died[go] = (entered == WUMPUS) | (entered == HOLE)
+    carried = np.zeros(self.n_maps, dtype=bool)
+    carried[go] = entered == BAT
+    if carried.any():
+      self._bat_move(carried)
+
+    #shots: line of sight along the player's row or column, like shoot_action
+    #(up/left look at the cells before the player, down/right from the player on)
+    shoot = live & (actions >= 4)
+    w_row, w_col = self.wumpus[:, 0], self.wumpus[:, 1]
+    in_sight = np.select(
+      [direction == 0, direction == 1, direction == 2],
+      [(w_col == col) & (w_row < row), (w_col == col) & (w_row >= row), (w_row == row) & (w_col < col)],
+      (w_row == row) & (w_col >= col))
+    armed = shoot & (self.arrows > 0)
+    hit = armed & in_sight
+    self.arrows[armed] -= 1
+    rewards[shoot] = np.where(hit[shoot], Wumpus.shoot_score, -500)
+
+    self.tries[live] += 1
+    self.done |= live & (died | hit | (self.tries >= self.max_tries))
+    return self.states(), rewards, self.done.copy(), hit
+
+  #send the selected players to random cells without holes, bats or wumpus, like bat_move
+  def _bat_move(self, which):
+    grid = self.grid[which].reshape(which.sum(), -1)
+    free = (grid != HOLE) & (grid != BAT) & (grid != WUMPUS)
+    target = np.where(free, self.rng.random(grid.shape), -1.0).argmax(axis=1)
+    self.player[which] = np.column_stack(np.divmod(target, self.size))
+
+  #(player, wumpus, holes, bats) of map i as create_world expects them
+  def locations(self, i):
+    holes = np.argwhere(self.grid[i] == HOLE).tolist()
+    bats = np.argwhere(self.grid[i] == BAT).tolist()
+    return self.player[i].tolist(), self.wumpus[i].tolist(), holes, bats
+
+#q_learning over a GridWumpusBatch: every map plays training_number episodes and
+#all maps update one shared q table. Transitions that hit the same (state, action)
+#in one step are averaged, so a step applies the same update rule as q_learning
+#once per (state, action) whatever the batch size.
+#The action choice is plain epsilon-greedy with shots masked once a map is out of
+#arrows. It does not copy q_learning's policy: there is no check_if_near rule forcing
+#a shot next to the wumpus, no arrows < 0 branches, and epsilon does not decay.
+#returns rewards of shape (training_number, n_maps) and the q table
+def batch_q_learning(n_maps=1000, state_number=8, size=size, alpha=alpha, epsilon=epsilon, gamma=gamma, training_number=training_number, max_tries=max_tries, seed=None):
+  env = GridWumpusBatch(n_maps, size=size, max_tries=max_tries, seed=seed)
+  rng = env.rng
+  q_table = np.zeros((size * size, state_number))
+  n_entries = q_table.size
+  rewards = np.zeros((training_number, n_maps))
+
+  for x in range(training_number):
+    states = env.reset()
+    while not env.done.all():
+      live = ~env.done
+      #epsilon-greedy, shooting only while arrows are left
+      q_rows = q_table[states]
+      q_rows[env.arrows <= 0, 4:] = -np.inf
+      greedy = q_rows.argmax(axis=1)
+      explore = rng.integers(0, np.where(env.arrows > 0, state_number, 4))
+      action_taken = np.where(rng.random(n_maps) < epsilon, explore, greedy)
+
+      new_states, new_reward, done, hit = env.step(action_taken)
+      rewards[x, live] += new_reward[live]
+
+      #shared update, averaged over the maps that took the same (state, action)
+      entry = states[live] * state_number + action_taken[live]
+      target = new_reward[live] + gamma * q_table[new_states[live]].max(axis=1)
+      counts = np.bincount(entry, minlength=n_entries)
+      target_sum = np.bincount(entry, weights=target, minlength=n_entries)
+      seen = counts > 0
+      flat = q_table.reshape(-1)
+      flat[seen] = (1 - alpha) * flat[seen] + alpha * target_sum[seen] / counts[seen]
+      states = new_states
+  return rewards, q_table
+
 cell_size = 100
 
 def create_world(player_location, wumpus_location, hole_location, bat_location):
@@ -0,0 +1,222 @@
+import itertools
+import os
+import struct
+
+import numpy as np
+
+from env import EVENTS, SMELL_MSG, RUSTLE_MSG, BREEZE_MSG, PERCEPT_ORDERS
+
+# --- File layout ---
+#
+#   [header: 16 bytes][record][record]...
+#
+# Every record is 16 bytes, so the file can be np.memmap'ed as one array and
+# any episode located with a vectorized scan of the `kind` column. An
+# episode is one START record, one THREAT record per hazard, then one STEP
+# record per env.step():
+#
+#   kind    START         THREAT        STEP
+#   code    -             threat code   action
+#   event   -             -             EVENTS index
+#   flags   state flags   -             next-state flags
+#   room    player room   hazard room   next player room
+#   wumpus  wumpus room   -             wumpus room after the step (0 = dead)
+#   arrows  arrows        -             next arrows
+#   done    -             -             1 on the last step
+#   cave    cave id       cave id       cave id
+#   reward  -             -             step reward
+#
+# flags is wumpus_alive << 3 | env.percept_code: (smell, rustle, breeze) in
+# bits 2..0 and, in bits 6..4, the order the env listed the percepts in (an
+# index into env.PERCEPT_ORDERS), so replays show the percept lines as the
+# game did. Logs written before the order was recorded read as order 0.
+
+MAGIC = b"WTRJ"
+VERSION = 1
+HEADER = struct.Struct("<4sHH8x")
+HEADER_SIZE = HEADER.size
+
+RECORD = np.dtype([
+    ("kind", "u1"),
+    ("code", "u1"),
+    ("event", "u1"),
+    ("flags", "u1"),
+    ("room", "<u2"),
+    ("wumpus", "<u2"),
+    ("arrows", "u1"),
+    ("done", "u1"),
+    ("cave", "<u2"),
+    ("reward", "<f4"),
+])
+
+# same layout as RECORD, used by the writer
+RECORD_STRUCT = struct.Struct("<BBBBHHBBHf")
+
+KIND_START, KIND_THREAT, KIND_STEP = 0, 1, 2
+THREATS = ("", "bat", "pit", "wumpus")
+THREAT_CODES = {name: code for code, name in enumerate(THREATS) if name}
+EVENT_CODES = {name: code for code, name in enumerate(EVENTS)}
+STATE_FLAGS = 0x0F
+
+
+def unpack_state(room, arrows, flags):
+    """Rebuild the (room, arrows, wumpus_alive, smell, rustle, breeze) tuple."""
+    return (int(room), int(arrows),
+            (flags >> 3) & 1, (flags >> 2) & 1, (flags >> 1) & 1, flags & 1)
+
+
+def percepts_from_flags(flags):
+    present = {SMELL_MSG: flags & 4, RUSTLE_MSG: flags & 2, BREEZE_MSG: flags & 1}
+    return [p for p in PERCEPT_ORDERS[(flags >> 4) & 7] if present[p]]
+
+
+class TrajectoryWriter:
+    """
+    Append-only trajectory logger.
+
+    The hot path only appends one flat tuple per record. Every
+    `chunk_records` records the pending tuples are packed in one pass and
+    appended to the file with a single write. Opening an existing log
+    appends to it.
+    """
+
+    def __init__(self, path, chunk_records=16384, cave_id=0):
+        self.path = path
+        self.chunk_records = chunk_records
+        self.cave_id = cave_id
+        self._pending = []
+
+        if os.path.exists(path) and os.path.getsize(path) >= HEADER_SIZE:
+            _check_header(path)
+            self._file = open(path, "ab")
+            # drop a torn record left by an interrupted writer
+            size = os.path.getsize(path)
+            self._file.truncate(size - (size - HEADER_SIZE) % RECORD.itemsize)
+        else:
+            self._file = open(path, "wb")
+            self._file.write(HEADER.pack(MAGIC, VERSION, RECORD.itemsize))
+
+    def start_episode(self, env):
+        """Record the initial layout right after env.reset()."""
+        cave = self.cave_id
+        wumpus = env.wumpus_room or 0
+        flags = (wumpus != 0) << 3 | env.percept_code
+        append = self._pending.append
+        append((KIND_START, 0, 0, flags, env.player_room, wumpus, env.arrows, 0, cave, 0.0))
+        for room, threat in env.threats.items():
+            append((KIND_THREAT, THREAT_CODES[threat], 0, 0, room, 0, 0, 0, cave, 0.0))
+
+    def record_step(self, env, action, reward, next_state, done, info):
+        """Record one env.step() result."""
+        pending = self._pending
+        pending.append((
+            KIND_STEP, action, EVENT_CODES[info["event"]],
+            next_state[2] << 3 | env.percept_code,
+            next_state[0], env.wumpus_room or 0, next_state[1], done, self.cave_id, reward,
+        ))
+        if len(pending) >= self.chunk_records:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            self._file.write(b"".join(itertools.starmap(RECORD_STRUCT.pack, self._pending)))
+            self._file.flush()
+            self._pending.clear()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+
+def _check_header(path):
+    with open(path, "rb") as f:
+        magic, version, record_size = HEADER.unpack(f.read(HEADER_SIZE))
+    if magic != MAGIC or version != VERSION or record_size != RECORD.itemsize:
+        raise ValueError(f"{path} is not a trajectory log (version {VERSION})")
+
+
+class TrajectoryLog:
+    """
+    Read-only, memory-mapped view of a trajectory log.
+
+    log.records is the full record array; log[i] is the record slice for
+    episode i (negative indices count from the end).
+    """
+
+    def __init__(self, path):
+        _check_header(path)
+        self.path = path
+        n = (os.path.getsize(path) - HEADER_SIZE) // RECORD.itemsize
+        if n:
+            self.records = np.memmap(path, dtype=RECORD, mode="r",
+                                     offset=HEADER_SIZE, shape=(n,))
+        else:
+            self.records = np.zeros(0, dtype=RECORD)
+        self.starts = np.flatnonzero(self.records["kind"] == KIND_START)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, episode):
+        begin = self.starts[episode]
+        pos = np.searchsorted(self.starts, begin)
+        end = self.starts[pos + 1] if pos + 1 < len(self.starts) else len(self.records)
+        return self.records[begin:end]
+
+    def layout(self, episode):
+        """(player_room, arrows, threats) at the start of an episode."""
+        recs = self[episode]
+        start = recs[0]
+        threats = {int(r["room"]): THREATS[r["code"]]
+                   for r in recs[recs["kind"] == KIND_THREAT]}
+        return int(start["room"]), int(start["arrows"]), threats
+
+    def steps(self, episode):
+        recs = self[episode]
+        return recs[recs["kind"] == KIND_STEP]
+
+
+class EpisodeReplay:
+    """
+    Plays back a recorded episode without re-simulating. Exposes the same
+    attributes WumpusEnv does (player_room, arrows, step_count, percepts,
+    threats, game_over, win), so it can be passed to main.draw_world.
+    """
+
+    def __init__(self, log, episode, cave):
+        self.cave = cave
+        self.player_room, self.arrows, self.threats = log.layout(episode)
+        start = log[episode][0]
+        self.percepts = percepts_from_flags(int(start["flags"]))
+        self.step_count = 0
+        self.game_over = False
+        self.win = False
+        self.last_action = None
+        self.last_reward = 0.0
+        self.last_event = "none"
+        self._steps = log.steps(episode)
+
+    def step(self):
+        """Advance one recorded step. Returns True once the episode is over."""
+        if self.step_count >= len(self._steps):
+            self.game_over = True
+            return True
+
+        rec = self._steps[self.step_count]
+        self.step_count += 1
+        self.player_room = int(rec["room"])
+        self.arrows = int(rec["arrows"])
+        self.last_action = int(rec["code"])
+        self.last_reward = float(rec["reward"])
+        self.last_event = EVENTS[rec["event"]]
+
+        # keep the Wumpus where the log says it is
+        for room in [r for r, t in self.threats.items() if t == "wumpus"]:
+            del self.threats[room]
+        if rec["wumpus"]:
+            self.threats[int(rec["wumpus"])] = "wumpus"
+
+        self.game_over = bool(rec["done"])
+        self.win = self.last_event == "win"
+        self.percepts = [] if self.game_over else percepts_from_flags(int(rec["flags"]))
+        return self.game_over
@@ -0,0 +1,109 @@
+import numpy as np
+
+from env import N_ACTIONS, MAX_ARROWS, state_index, index_state
+
+
+class VisitCounts:
+    """
+    Per-(state, action) visit counters for q_learn, stored as one
+    (n_states, N_ACTIONS) array indexed by env.state_index.
+
+    omega       if set, the step size for an update is max(alpha_min, 1 / n**omega)
+                where n counts visits to that pair including this one
+                (0.5 < omega <= 1 satisfies the usual convergence conditions);
+                if None, q_learn's global alpha is used
+    ucb_c       if > 0, greedy action selection adds the exploration bonus
+                ucb_c * sqrt(ln(N(s) + 1) / (n(s, a) + 1))
+    """
+
+    def __init__(self, n_states, omega=0.8, alpha_min=0.0, ucb_c=0.0):
+        self.counts = np.zeros((n_states, N_ACTIONS), dtype=np.int64)
+        self.omega = omega
+        self.alpha_min = alpha_min
+        self.ucb_c = ucb_c
+
+    # ---------- per-step API (used by q_learn) ----------
+
+    def visit(self, state, action, alpha):
+        """Count one update of (state, action) and return its step size."""
+        idx = state_index(state)
+        self.counts[idx, action] += 1
+        if self.omega is None:
+            return alpha
+        return max(self.alpha_min, float(self.counts[idx, action]) ** -self.omega)
+
+    def bonus(self, state):
+        """UCB bonus for each action of `state`."""
+        row = self.counts[state_index(state)]
+        return self.ucb_c * np.sqrt(np.log(row.sum() + 1.0) / (row + 1.0))
+
+    # ---------- whole-table views ----------
+
+    def step_sizes(self):
+        """Step size each entry would get on its next update."""
+        if self.omega is None:
+            return None
+        return np.maximum(self.alpha_min, (self.counts + 1.0) ** -self.omega)
+
+    def bonuses(self):
+        n_state = self.counts.sum(axis=1, keepdims=True)
+        return self.ucb_c * np.sqrt(np.log(n_state + 1.0) / (self.counts + 1.0))
+
+    def unvisited_states(self, live_only=True):
+        """
+        States never updated. With live_only, terminal states are left out:
+        the Wumpus already dead (a win) or no arrows left (a loss).
+        """
+        rows = np.flatnonzero(self.counts.sum(axis=1) == 0)
+        states = [index_state(int(i)) for i in rows]
+        if live_only:
+            states = [s for s in states if s[2] == 1 and s[1] > 0]
+        return states
+
+    def coverage(self):
+        """
+        Visited fractions overall and per arrow count, computed over live
+        states (wumpus_alive = 1). Not every percept combination can occur
+        in every room, so 100% is not reachable.
+        """
+        per_state = self.counts.reshape(-1, MAX_ARROWS + 1, 2, 8, N_ACTIONS)[:, :, 1]
+        state_visited = per_state.sum(axis=-1) > 0        # (rooms, arrows, percepts)
+        pair_visited = per_state > 0
+        return {
+            "states": (int(state_visited.sum()), state_visited.size),
+            "pairs": (int(pair_visited.sum()), pair_visited.size),
+            "by_arrows": [
+                (int(state_visited[:, a].sum()), state_visited[:, a].size)
+                for a in range(MAX_ARROWS + 1)
+            ],
+        }
+
+    def coverage_report(self, first=10):
+        """
+        Coverage counts, then the unvisited live states: how many per room
+        and arrow count, and the first `first` of them. Some of them cannot
+        occur at all (percepts that room's neighbours cannot produce).
+        """
+        cov = self.coverage()
+        lines = [
+            f"States visited: {cov['states'][0]}/{cov['states'][1]} "
+            f"({cov['states'][0] / cov['states'][1] * 100:.1f}%)",
+            f"State-action pairs visited: {cov['pairs'][0]}/{cov['pairs'][1]} "
+            f"({cov['pairs'][0] / cov['pairs'][1] * 100:.1f}%)",
+        ]
+        for arrows, (seen, total) in enumerate(cov["by_arrows"]):
+            lines.append(f"  arrows={arrows}: {seen}/{total} states visited")
+
+        unvisited = self.unvisited_states()
+        lines.append(f"Unvisited live states: {len(unvisited)}")
+        if unvisited:
+            by_room = {}
+            for room, arrows, *_rest in unvisited:
+                by_room.setdefault(room, [0] * MAX_ARROWS)[arrows - 1] += 1
+            lines.append("  per room, arrows=" + " ".join(f"{a:>2}" for a in range(1, MAX_ARROWS + 1)))
+            for room in sorted(by_room):
+                lines.append(f"  room {room:>3}:        " + " ".join(f"{n:>2}" for n in by_room[room]))
+            lines.append(f"  first {min(first, len(unvisited))} "
+                         "(room, arrows, wumpus_alive, smell, rustle, breeze):")
+            lines.extend(f"    {s}" for s in unvisited[:first])
+        return "\n".join(lines)